@@ -0,0 +1,160 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from lexical_index import TOKEN_PATTERN, tokenize
+
+SENTENCE_END = re.compile(r"[.?!]\s*$")
+
+
+def key_terms(question):
+    """Tokens a cached answer must share with the question: numbers, codes and proper nouns.
+
+    "Muvattupuzha bus" and "Thodupuzha bus", or "route 7" and "route 12",
+    embed close together but need different answers. Words with a digit
+    count, and so do capitalized words that do not start a sentence.
+    """
+    terms = set()
+    for match in TOKEN_PATTERN.finditer(question):
+        word = match.group()
+        starts_sentence = not question[:match.start()].strip() or SENTENCE_END.search(question[:match.start()])
+        if any(c.isdigit() for c in word) or (word[0].isupper() and word != "I" and not starts_sentence):
+            terms.update(tokenize(word))
+    return frozenset(terms)
+
+
+class SemanticAnswerCache:
+    """Answers to previous questions, found again by embedding similarity.
+
+    Entries are scoped by answer language and corpus version. A question
+    matches a cached one in the same scope when the cosine similarity of
+    their embeddings is at least `threshold` and both have the same
+    `key_terms`; benchmarks/bench_answer_cache.py measures the threshold
+    on near-miss question pairs. Entries expire `ttl` seconds
+    after they were written, and the least recently used ones are evicted
+    beyond `max_entries`. A new corpus version makes every older entry
+    unreachable, and the next write deletes those entries.
+    """
+
+    def __init__(self, embeddings, path="answer_cache.db", threshold=0.93, ttl=24 * 3600, max_entries=5000):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                language TEXT NOT NULL,
+                corpus_version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                sources TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_scope ON answers (language, corpus_version)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        self.conn.commit()
+        # (language, corpus_version) -> (ids, unit vectors, key terms), loaded on first use
+        self.scopes = {}
+        self.hits = 0
+        self.misses = 0
+        self.key_term_rejections = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def embed(self, question):
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def scope(self, language, corpus_version):
+        key = (language, corpus_version)
+        if key not in self.scopes:
+            rows = self.conn.execute(
+                "SELECT id, vector, question FROM answers WHERE language = ? AND corpus_version = ? AND created >= ?",
+                (language, corpus_version, time.time() - self.ttl)
+            ).fetchall()
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            vectors = np.array([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+            self.scopes[key] = (ids, vectors, [key_terms(row[2]) for row in rows])
+        return self.scopes[key]
+
+    def lookup(self, question, language, corpus_version):
+        """Return (answer, source documents, similarity) for a close enough question, or None"""
+        vector = self.embed(question)
+        terms = key_terms(question)
+        with self.lock:
+            ids, vectors, keys = self.scope(language, corpus_version)
+            row = None
+            if len(ids):
+                similarities = vectors @ vector
+                close = similarities >= self.threshold
+                matching = close & np.array([k == terms for k in keys])
+                if close.any() and not matching.any():
+                    self.key_term_rejections += 1
+                best = int(np.argmax(np.where(matching, similarities, -np.inf)))
+                if matching[best]:
+                    row = self.conn.execute(
+                        "SELECT answer, sources, created FROM answers WHERE id = ?", (int(ids[best]),)
+                    ).fetchone()
+                    if row and row[2] < time.time() - self.ttl:
+                        self.expire()
+                        row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), int(ids[best])))
+            self.conn.commit()
+        sources = [Document(page_content=s["page_content"], metadata=s["metadata"]) for s in json.loads(row[1])]
+        return row[0], sources, float(similarities[best])
+
+    def put(self, question, language, corpus_version, answer, sources):
+        vector = self.embed(question)
+        sources = json.dumps([{"page_content": doc.page_content, "metadata": doc.metadata} for doc in sources])
+        now = time.time()
+        with self.lock:
+            # answers about an older corpus can never be served again
+            self.conn.execute("DELETE FROM answers WHERE corpus_version != ?", (corpus_version,))
+            self.conn.execute(
+                "INSERT INTO answers (language, corpus_version, question, vector, answer, sources, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (language, corpus_version, question, vector.tobytes(), answer, sources, now, now)
+            )
+            excess = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+            self.conn.commit()
+            self.scopes.clear()
+
+    def expire(self):
+        """Delete entries older than the TTL; called with the lock held"""
+        cursor = self.conn.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl,))
+        self.conn.commit()
+        self.expirations += cursor.rowcount
+        self.scopes.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "key_term_rejections": self.key_term_rejections,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
@@ -0,0 +1,81 @@
+"""Choosing the semantic answer cache's similarity threshold.
+
+Embeds pairs of college questions with the app's bge-small model. Each
+near-miss pair should get a different answer, such as another hostel,
+bus route, branch or year. Each paraphrase pair asks the same thing in
+other words. For each threshold the benchmark counts:
+- near misses that would be served the other question's cached answer,
+  by similarity alone and with the key-term check of
+  SemanticAnswerCache;
+- paraphrases that would still hit the cache.
+It then prints the lowest threshold that serves no near miss.
+
+    python benchmarks/bench_answer_cache.py
+"""
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from answer_cache import key_terms
+from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+
+NEAR_MISSES = [
+    ("What is the men's hostel fee?", "What is the ladies' hostel fee?"),
+    ("What is the hostel fee for boys?", "What is the hostel fee for girls?"),
+    ("When does the Muvattupuzha bus leave?", "When does the Thodupuzha bus leave?"),
+    ("Where does bus route 7 start from?", "Where does bus route 12 start from?"),
+    ("What is the tuition fee for B.Tech CSE?", "What is the tuition fee for B.Tech ECE?"),
+    ("When do MCA admissions for 2024 close?", "When do MCA admissions for 2025 close?"),
+    ("When does the first semester exam start?", "When does the third semester exam start?"),
+    ("What are the library timings on Saturday?", "What are the library timings on Sunday?"),
+    ("Who is the head of the Civil department?", "Who is the head of the Mechanical department?"),
+    ("What is the bus fee from Kolenchery?", "What is the bus fee from Perumbavoor?"),
+    ("Is there a hostel for first year students?", "Is there a hostel for final year students?"),
+    ("What is the fee for the M.Tech program?", "What is the fee for the MBA program?"),
+]
+PARAPHRASES = [
+    ("What is the men's hostel fee?", "How much is the hostel fee for men?"),
+    ("When does the Muvattupuzha bus leave?", "What time does the bus to Muvattupuzha leave?"),
+    ("Where does bus route 7 start from?", "What is the starting point of bus route 7?"),
+    ("What is the tuition fee for B.Tech CSE?", "How much is the B.Tech CSE tuition fee?"),
+    ("When do MCA admissions for 2024 close?", "What is the last date for MCA admissions 2024?"),
+    ("What are the library timings on Saturday?", "When is the library open on Saturday?"),
+    ("Who is the head of the Civil department?", "Who heads the Civil department?"),
+    ("Is there a hostel for girls?", "Does the college have a girls' hostel?"),
+    ("How can I pay the bus fee?", "What are the ways to pay the bus fee?"),
+    ("What documents are needed for admission?", "Which documents should I bring for admission?"),
+]
+
+
+def pair_scores(embeddings, pairs):
+    """(cosine similarity, same key terms) of every pair"""
+    vectors = np.asarray(embeddings.embed_documents([q for pair in pairs for q in pair]), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [(float(vectors[2 * i] @ vectors[2 * i + 1]), key_terms(a) == key_terms(b))
+            for i, (a, b) in enumerate(pairs)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default="BAAI/bge-small-en-v1.5")
+    args = parser.parse_args()
+
+    embeddings = FastEmbedEmbeddings(model_name=args.model)
+    near_misses = pair_scores(embeddings, NEAR_MISSES)
+    paraphrases = pair_scores(embeddings, PARAPHRASES)
+
+    print(f"{len(NEAR_MISSES)} near-miss pairs, {len(PARAPHRASES)} paraphrase pairs, {args.model}")
+    print(f"{'threshold':>9} {'wrong hits':>11} {'with key terms':>15} {'paraphrase hits':>16}")
+    chosen = None
+    for threshold in np.arange(0.80, 1.0, 0.01):
+        wrong = sum(score >= threshold for score, _ in near_misses)
+        wrong_checked = sum(score >= threshold and same for score, same in near_misses)
+        hits = sum(score >= threshold and same for score, same in paraphrases)
+        print(f"{threshold:9.2f} {wrong:11} {wrong_checked:15} {hits:16}")
+        if chosen is None and wrong_checked == 0:
+            chosen = threshold
+    print(f"\nlowest threshold serving no near miss: {'none' if chosen is None else f'{chosen:.2f}'}")
+    for (a, b), (score, same) in zip(NEAR_MISSES, near_misses):
+        print(f"  {score:.3f} {'same key terms' if same else 'key terms differ':<16} {a} / {b}")
@@ -0,0 +1,82 @@
+"""Crawl throughput against a local fixture site.
+
+Serves a synthetic site of interlinked pages from a ThreadingHTTPServer with a
+fixed per-request latency and reports pages/second for a serial crawl
+(one worker, one request in flight) versus the concurrent crawler, then
+a cold and a warm crawl through an HttpCache (the fixture honours ETags).
+
+    python benchmarks/bench_crawler.py --pages 100 --latency 0.05
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from crawler import Crawler
+from http_cache import HttpCache
+
+
+def make_handler(n_pages, latency):
+    class FixtureSite(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            page = int(self.path.strip('/').split('/')[-1] or 0)
+            etag = f'"page-{page}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            links = ''.join(
+                f'<a href="/page/{(page * 7 + i) % n_pages}">link {i}</a>'
+                for i in range(1, 8)
+            )
+            body = f'<html><body><h1>Page {page}</h1><p>{"lorem ipsum " * 200}</p>{links}</body></html>'.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FixtureSite
+
+
+def run(label, base_url, max_pages, **crawler_kwargs):
+    crawler = Crawler(requests.Session(), **crawler_kwargs)
+    pages = crawler.crawl(base_url, max_pages)
+    line = (f"{label:<28} {len(pages):>4} pages in {crawler.elapsed:6.2f}s  "
+            f"{crawler.pages_per_second:7.1f} pages/s")
+    if crawler.cache is not None:
+        line += f"  cache hits {crawler.cache.hits}, misses {crawler.cache.misses}"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--rate', type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.pages, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/page/0"
+
+    try:
+        run("serial (1 worker)", base_url, args.pages, max_workers=1, per_host=1, rate=args.rate)
+        run("concurrent (8 workers)", base_url, args.pages, max_workers=8, per_host=8, rate=args.rate)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = os.path.join(tmp, 'http_cache.db')
+            for label in ("cached, cold", "cached, warm (304s)"):
+                run(label, base_url, args.pages, max_workers=8, per_host=8, rate=args.rate,
+                    cache=HttpCache(cache_path))
+    finally:
+        server.shutdown()
@@ -0,0 +1,116 @@
+"""Recall and latency of dense MMR retrieval versus BM25 + dense fused by RRF.
+
+Builds a fixture corpus of exact-token facts (bus routes, course codes,
+faculty names, fee heads) among filler chunks, embeds it with the app's
+bge-small model, and asks one question per fact. Reports recall@k of the
+chunk holding the answer and mean ms/query for the current retriever
+(MMR, k=5, fetch_k=15) and the hybrid one. A second table times the
+lexical index alone on a larger synthetic corpus.
+
+    python benchmarks/bench_hybrid.py --facts 60 --scale 20000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lexical_index import LexicalIndex, HybridRetriever
+from langchain_core.documents import Document
+from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+from langchain_community.vectorstores import FAISS
+
+NAMES = ["Anitha Joseph", "Biju Mathew", "Deepa Varghese", "George Kurian", "Lakshmi Nair",
+         "Manoj Thomas", "Reshma Paul", "Sajan George", "Tessy Jacob", "Vinod Kumar"]
+PLACES = ["Muvattupuzha", "Thodupuzha", "Kolenchery", "Perumbavoor", "Kothamangalam", "Piravom"]
+SUBJECTS = ["Data Structures", "Signals and Systems", "Fluid Mechanics", "Compiler Design",
+            "Machine Learning", "Power Electronics", "Surveying", "Digital Electronics"]
+FEE_HEADS = ["caution deposit", "university exam fee", "lab fee", "bus fee", "PTA fund", "library fee"]
+FILLER = ("The college follows the academic calendar published by the university and notifies "
+          "students of changes through the department notice boards and the official website.")
+
+
+def make_facts(n, rng):
+    facts = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            route = 10 + i
+            facts.append((f"Bus route {route} starts from {rng.choice(PLACES)} at 7:{i % 60:02d} AM.",
+                          f"Where does bus route {route} start from?"))
+        elif kind == 1:
+            code = f"CS{200 + i}"
+            facts.append((f"{code} {rng.choice(SUBJECTS)} is offered in semester {i % 8 + 1}.",
+                          f"Which semester offers {code}?"))
+        elif kind == 2:
+            name = f"{rng.choice(NAMES)} {chr(65 + i % 26)}."
+            facts.append((f"Prof. {name} coordinates the {rng.choice(SUBJECTS)} lab sessions.",
+                          f"Which lab does Prof. {name} coordinate?"))
+        else:
+            head = rng.choice(FEE_HEADS)
+            facts.append((f"The {head} for batch 20{i % 100:02d} is Rs. {1000 + 37 * i}.",
+                          f"What is the {head} for batch 20{i % 100:02d}?"))
+    return facts
+
+
+def timed_recall(retriever, questions, k):
+    hits, latencies = 0, []
+    for question, gold in questions:
+        started = time.perf_counter()
+        docs = retriever.invoke(question)
+        latencies.append(time.perf_counter() - started)
+        hits += gold in [doc.page_content for doc in docs[:k]]
+    return hits / len(questions), statistics.mean(latencies) * 1000
+
+
+def lexical_scale(n_chunks, rng, queries=200):
+    vocabulary = [f"w{i}" for i in range(20000)]
+    docs = [Document(page_content=' '.join(rng.choices(vocabulary, k=150)), metadata={"source": f"s{i // 20}"})
+            for i in range(n_chunks)]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LexicalIndex(os.path.join(tmp, "lexical.db"))
+        started = time.perf_counter()
+        index.add([str(i) for i in range(n_chunks)], docs)
+        index.commit()
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(queries):
+            index.search(' '.join(rng.choices(vocabulary, k=6)), 15)
+        return build, (time.perf_counter() - started) / queries * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default="BAAI/bge-small-en-v1.5")
+    parser.add_argument('--facts', type=int, default=60)
+    parser.add_argument('--filler', type=int, default=200)
+    parser.add_argument('--scale', type=int, default=20000)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    facts = make_facts(args.facts, rng)
+    chunks = [fact for fact, _ in facts] + [f"{FILLER} Notice {i}." for i in range(args.filler)]
+    documents = [Document(page_content=text, metadata={"source": f"page-{i}"}) for i, text in enumerate(chunks)]
+    questions = [(question, fact) for fact, question in facts]
+
+    vectordb = FAISS.from_documents(documents, FastEmbedEmbeddings(model_name=args.model))
+    dense = vectordb.as_retriever(search_type='mmr', search_kwargs={'k': args.k, 'fetch_k': 15, 'lambda_mult': 0.75})
+    with tempfile.TemporaryDirectory() as tmp:
+        lexical_index = LexicalIndex(os.path.join(tmp, "lexical.db"))
+        lexical_index.add([str(i) for i in range(len(documents))], documents)
+        lexical_index.commit()
+        hybrid = HybridRetriever(vector_retriever=dense, lexical_index=lexical_index, k=args.k)
+        dense.invoke("warm up")
+
+        print(f"{len(chunks)} chunks, {len(questions)} exact-token questions, recall@{args.k}")
+        for label, retriever in (("dense MMR (current)", dense), ("BM25 + dense, RRF", hybrid)):
+            recall, latency = timed_recall(retriever, questions, args.k)
+            print(f"{label:<22} recall {recall:5.2f}  {latency:7.2f} ms/query")
+
+    build, latency = lexical_scale(args.scale, rng)
+    print(f"\nlexical index alone, {args.scale} chunks x 150 tokens: "
+          f"built in {build:.1f}s, {latency:.2f} ms/query")
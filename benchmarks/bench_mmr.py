@@ -0,0 +1,54 @@
+"""Latency of LangChain's maximal_marginal_relevance versus mmr.mmr_select.
+
+Draws random bge-small-sized (384-d) query and candidate vectors, checks
+that both implementations select the same candidates, and reports the
+median time per selection at the apps' current setting (k=5, fetch_k=15)
+and at larger candidate pools. Embedding and the nearest-neighbour search
+are the same for both and are left out.
+
+    python benchmarks/bench_mmr.py --dim 384 --repeat 200
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mmr import mmr_select, normalize_rows
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+SIZES = [(5, 15), (10, 100), (10, 200), (20, 500), (20, 1000)]
+
+
+def timed(select, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        select()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--lambda-mult', type=float, default=0.75)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'k':>3} {'fetch_k':>8} {'langchain ms':>13} {'mmr_select ms':>14} {'normalized ms':>14} {'same picks':>11}")
+    for k, fetch_k in SIZES:
+        query = rng.normal(size=args.dim).astype(np.float32)
+        # candidates clustered around the query, as a nearest-neighbour search returns them
+        candidates = (query + rng.normal(scale=1.5, size=(fetch_k, args.dim))).astype(np.float32)
+        normalized = normalize_rows(candidates)
+
+        stock = lambda: maximal_marginal_relevance(query[None, :], candidates, args.lambda_mult, k)
+        ours = lambda: mmr_select(query, candidates, k, args.lambda_mult)
+        prenormalized = lambda: mmr_select(query, normalized, k, args.lambda_mult, normalized=True)
+        same = stock() == ours() == prenormalized()
+        print(f"{k:>3} {fetch_k:>8} {timed(stock, args.repeat):13.3f} {timed(ours, args.repeat):14.3f} "
+              f"{timed(prenormalized, args.repeat):14.3f} {str(same):>11}")
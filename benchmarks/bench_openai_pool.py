@@ -0,0 +1,156 @@
+"""Network work per Streamlit rerun, before and after OpenAIClientPool.
+
+Starts a local OpenAI-compatible stub (GET /v1/models and streaming
+POST /v1/chat/completions) that counts requests and TCP connections,
+then simulates reruns of a bring-your-own-key session. Before: every
+rerun builds an openai.OpenAI client, lists the models and builds a new
+ChatOpenAI. After: the model list comes from the pool's TTL cache and
+the ChatOpenAI is reused. Every `--ask-every`th rerun also streams an
+answer. Over the internet each new connection is a TLS handshake.
+
+It then streams `--turns` async answers through the shared ChatOpenAI,
+once with an `asyncio.run` per turn and once on the process-wide
+EventLoopThread, and checks the latter sends exactly one completion
+request per turn (a connection left behind by a closed loop makes the
+first version fail and silently retry).
+
+    python benchmarks/bench_openai_pool.py --reruns 50 --ask-every 5 --turns 2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import openai
+from langchain_openai import ChatOpenAI
+from openai_clients import OpenAIClientPool
+from event_loop import EventLoopThread
+
+MODELS = [{"id": name, "object": "model", "created": 1700000000 + i, "owned_by": "stub"}
+          for i, name in enumerate(["gpt-4o-mini", "gpt-4o", "text-embedding-3-small", "gpt-4.1-mini"])]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    counts = {"connections": 0, "models": 0, "completions": 0}
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            self.counts["connections"] += 1
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.lock:
+            self.counts["models"] += 1
+        self.send_json({"object": "list", "data": MODELS})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.lock:
+            self.counts["completions"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in ["The ", "bus ", "leaves ", "at ", "7:45."]:
+            chunk = {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini",
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+
+def run(label, rerun, reruns, ask_every):
+    for key in StubHandler.counts:
+        StubHandler.counts[key] = 0
+    started = time.perf_counter()
+    for i in range(reruns):
+        llm = rerun()
+        if (i + 1) % ask_every == 0:
+            "".join(chunk.content for chunk in llm.stream("When does the bus leave?"))
+    elapsed = (time.perf_counter() - started) / reruns * 1000
+    counts = StubHandler.counts
+    print(f"{label:<22} {elapsed:9.2f} {counts['models']:>8} {counts['completions']:>12} {counts['connections']:>12}")
+
+
+def run_async(label, run_turn, llm, turns):
+    async def turn():
+        return "".join([chunk.content async for chunk in llm.astream("When does the bus leave?")])
+
+    for key in StubHandler.counts:
+        StubHandler.counts[key] = 0
+    started = time.perf_counter()
+    for _ in range(turns):
+        run_turn(turn())
+    elapsed = (time.perf_counter() - started) / turns * 1000
+    print(f"{label:<22} {elapsed:9.2f} {StubHandler.counts['completions']:>12}")
+    return StubHandler.counts["completions"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reruns', type=int, default=50)
+    parser.add_argument('--ask-every', type=int, default=5)
+    parser.add_argument('--turns', type=int, default=2)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    api_key = "sk-stub"
+
+    def before():
+        client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        models = [i.id for i in client.models.list() if str(i.id).startswith("gpt")]
+        return ChatOpenAI(model_name=models[0], temperature=0, streaming=True, api_key=api_key, base_url=base_url)
+
+    pool = OpenAIClientPool(base_url=base_url)
+    llms = {}
+
+    def after():
+        model = pool.gpt_models(api_key)[0]
+        if model not in llms:
+            llms[model] = ChatOpenAI(model_name=model, temperature=0, streaming=True, api_key=api_key,
+                                     base_url=pool.base_url, http_client=pool.http_client)
+        return llms[model]
+
+    print(f"{args.reruns} reruns, an answer streamed every {args.ask_every}")
+    print(f"{'':<22} {'ms/rerun':>9} {'/models':>8} {'completions':>12} {'connections':>12}")
+    run("new clients (before)", before, args.reruns, args.ask_every)
+    run("client pool (after)", after, args.reruns, args.ask_every)
+    print(f"pool: {pool.stats()}")
+
+    def shared_llm():
+        return ChatOpenAI(model_name="gpt-4o-mini", temperature=0, streaming=True, api_key=api_key,
+                          base_url=pool.base_url, http_client=pool.http_client,
+                          http_async_client=pool.http_async_client)
+
+    print(f"\n{args.turns} async turns through a shared ChatOpenAI")
+    print(f"{'':<22} {'ms/turn':>9} {'completions':>12}")
+    run_async("asyncio.run per turn", asyncio.run, shared_llm(), args.turns)
+    pool = OpenAIClientPool(base_url=base_url)
+    event_loop = EventLoopThread()
+    completions = run_async("shared event loop", lambda turn: event_loop.submit(turn).result(), shared_llm(),
+                            args.turns)
+    assert completions == args.turns, f"{completions} completion requests for {args.turns} turns"
+    server.shutdown()
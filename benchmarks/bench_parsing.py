@@ -0,0 +1,119 @@
+"""Multi-file upload parsing: inline versus the process pool, and peak memory.
+
+Generates synthetic text PDFs (similar in size to the faculty lists, fee
+structure and bus-route documents) and times `iter_document_pages` parsing
+them on the calling thread and across the shared process pool. It then
+compares the peak Python heap of splitting one long PDF from a single joined
+string against streaming it page by page into the splitter.
+
+    python benchmarks/bench_parsing.py --files 6 --pages 40 --long-pages 400
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extraction import PDF_TYPE, get_parse_pool, iter_document_pages
+from pypdf import PdfReader
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+def make_pdf(n_pages, lines_per_page=45):
+    """Minimal multi-page PDF with Helvetica text on every page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(n_pages):
+        lines = [f"({'Route %d stop %d departs 07:%02d fee Rs %d' % (page, i, i, 1000 + i)}) Tj T*"
+                 for i in range(lines_per_page)]
+        stream = ("BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(lines) + " ET").encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % n_pages
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def write_pdfs(folder, count, n_pages):
+    files = []
+    for i in range(count):
+        path = os.path.join(folder, f"doc{i}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(n_pages))
+        files.append((f"doc{i}.pdf", PDF_TYPE, path))
+    return files
+
+
+def timed(label, files, **kwargs):
+    started = time.perf_counter()
+    pages = sum(1 for _ in iter_document_pages(files, **kwargs))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {pages:>5} pages in {elapsed:6.2f}s  {pages / elapsed:8.1f} pages/s")
+    return elapsed
+
+
+def peak_memory(label, split):
+    tracemalloc.start()
+    chunks = split()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {chunks:>5} chunks, peak heap {peak / 2**20:7.1f} MiB")
+
+
+def split_joined(files, splitter):
+    """The old path: one reader, every page text joined, every chunk kept for one add_documents call"""
+    reader = PdfReader(files[0][2])
+    text = "\n".join(page.extract_text() for page in reader.pages)
+    splits = splitter.split_documents([Document(page_content=text, metadata={"source": files[0][0]})])
+    return len(splits)
+
+
+def split_streamed(files, splitter):
+    chunks = 0
+    for page in iter_document_pages(files, parallel=False):
+        doc = Document(page_content=page.text, metadata={"source": files[0][0], "page": page.page})
+        # the embedder would consume these here; nothing is kept
+        chunks += len(splitter.split_documents([doc]))
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=6)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--long-pages', type=int, default=400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        files = write_pdfs(folder, args.files, args.pages)
+        # start the workers outside the measurement; in the app they live for the whole process
+        get_parse_pool().submit(len, b"").result()
+        sum(1 for _ in iter_document_pages(files[:1]))
+
+        print(f"{os.cpu_count()} cores")
+        inline = timed("inline", files, parallel=False)
+        pooled = timed("process pool", files)
+        print(f"speedup: {inline / pooled:.1f}x")
+
+        long_pdf = [(name, mime_type, path.replace("doc0", "long"))
+                    for name, mime_type, path in files[:1]]
+        with open(long_pdf[0][2], "wb") as f:
+            f.write(make_pdf(args.long_pages))
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=300)
+        split_streamed(files[:1], splitter)  # warm lazy imports before tracing
+        peak_memory("joined document", lambda: split_joined(long_pdf, splitter))
+        peak_memory("streamed pages", lambda: split_streamed(long_pdf, splitter))
@@ -0,0 +1,124 @@
+"""Retrieval hit rate and latency with and without the language instruction in the query.
+
+Before the change the integrated assistant retrieved on
+"<language instruction>\\n\\n<question>"; now it retrieves on the question
+alone and the instruction only reaches the answer prompt. This embeds a
+small fixture corpus with the app's bge-small model into a temporary
+Chroma store and builds the integrated page's retriever over it: a
+HybridRetriever fusing ChromaMMRRetriever (k=5, fetch_k=15,
+lambda_mult=0.75) with a BM25 LexicalIndex. It runs the bare questions and
+each instruction-prefixed form, reporting hit@1 / hit@k for the chunk that
+answers each question and the mean query latency (embedding plus search).
+It needs the bge-small model, so run it where the model can be loaded.
+
+    python benchmarks/bench_retrieval.py --repeat 3
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mmr import ChromaMMRRetriever
+from lexical_index import LexicalIndex, HybridRetriever
+from langchain_core.documents import Document
+from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+from langchain_community.vectorstores import Chroma
+
+LANGUAGE_PROMPTS = {
+    "en": "Respond in English with accurate information.",
+    "ml": "മലയാളത്തിൽ കൃത്യമായ വിവരങ്ങൾ ഉപയോഗിച്ച് മറുപടി നൽകുക.",
+    "hi": "सटीक जानकारी के साथ हिंदी में उत्तर दें।",
+    "ta": "துல்லியமான தகவலுடன் தமிழில் பதிலளிக்கவும்.",
+    "ar": "الرد باللغة العربية بمعلومات دقيقة."
+}
+
+CORPUS = [
+    "College buses leave the Muvattupuzha stand at 7:45 AM and Thodupuzha at 7:30 AM, returning at 4:15 PM.",
+    "The annual tuition fee for B.Tech under the merit quota is Rs. 75,000; management quota is Rs. 1,20,000.",
+    "Hostel fees are Rs. 45,000 per year for the men's hostel and Rs. 48,000 for the ladies' hostel, mess included.",
+    "Admission to B.Tech is through KEAM rank; bring the allotment memo, mark lists and transfer certificate.",
+    "The central library opens from 8:30 AM to 7:00 PM on working days and holds over 40,000 volumes.",
+    "The placement cell has placed students with TCS, Infosys, UST Global and IBS with packages up to 8 LPA.",
+    "Scholarships include the e-grantz scheme, the merit-cum-means scholarship and management fee waivers.",
+    "The M.Tech programme offers specialisations in VLSI, structural engineering and computer science.",
+    "Students must maintain 75% attendance in every course to be eligible for the university examinations.",
+    "The college canteen serves breakfast from 8 AM and lunch from 12:30 PM; it is closed on Sundays.",
+    "Anti-ragging committee complaints can be raised with the principal or through the online grievance portal.",
+    "The sports complex has a football ground, a basketball court, an indoor stadium and a gym for students.",
+    "Lateral entry admission to the second year of B.Tech is open to diploma holders through LET rank.",
+    "The MCA programme is two years long and admission is based on the LBS entrance examination.",
+    "Exam results are published on the KTU portal; revaluation requests must be filed within ten days.",
+    "NSS and NCC units run blood donation camps, village adoption drives and annual special camps.",
+]
+
+QUESTIONS = [
+    ("What time does the college bus leave?", 0),
+    ("How much is the B.Tech tuition fee?", 1),
+    ("What is the hostel fee per year?", 2),
+    ("Which documents are needed for B.Tech admission?", 3),
+    ("What are the library timings?", 4),
+    ("Which companies recruit students in placements?", 5),
+    ("What scholarships are available?", 6),
+    ("Which M.Tech specialisations are offered?", 7),
+    ("What is the minimum attendance requirement?", 8),
+    ("When is the canteen open?", 9),
+    ("How do I report ragging?", 10),
+    ("What sports facilities does the campus have?", 11),
+    ("Can diploma holders join B.Tech directly in second year?", 12),
+    ("How do I get admission to MCA?", 13),
+    ("How do I apply for revaluation?", 14),
+    ("What activities do NSS and NCC conduct?", 15),
+]
+
+
+def run(retriever, queries, k):
+    hits_at_1, hits_at_k, latencies = 0, 0, []
+    for query, gold in queries:
+        started = time.perf_counter()
+        docs = retriever.invoke(query)
+        latencies.append(time.perf_counter() - started)
+        found = [doc.metadata["chunk"] for doc in docs]
+        hits_at_1 += bool(found) and found[0] == gold
+        hits_at_k += gold in found[:k]
+    n = len(queries)
+    return hits_at_1 / n, hits_at_k / n, statistics.mean(latencies) * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', default="BAAI/bge-small-en-v1.5")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    embedding_model = FastEmbedEmbeddings(model_name=args.model)
+    tmp = tempfile.mkdtemp()
+    documents = [Document(page_content=text, metadata={"chunk": i, "source": f"chunk-{i}"})
+                 for i, text in enumerate(CORPUS)]
+    ids = [str(i) for i in range(len(CORPUS))]
+    vectordb = Chroma.from_documents(documents, embedding_model, ids=ids, persist_directory=os.path.join(tmp, "chroma"))
+    lexical_index = LexicalIndex(os.path.join(tmp, "lexical.db"))
+    lexical_index.add(ids, documents)
+    lexical_index.commit()
+    retriever = HybridRetriever(
+        vector_retriever=ChromaMMRRetriever(vectordb=vectordb, k=args.k, fetch_k=15, lambda_mult=0.75),
+        lexical_index=lexical_index,
+        k=args.k
+    )
+    retriever.invoke("warm up")
+
+    print(f"{len(CORPUS)} chunks, {len(QUESTIONS)} questions, hybrid MMR + BM25 k={args.k}, "
+          f"best of {args.repeat} for latency")
+    print(f"{'query':<38} {'hit@1':>6} {'hit@k':>6} {'ms/query':>9}")
+    cases = [("question only (after)", QUESTIONS)] + [
+        (f"{lang} instruction + question (before)", [(f"{prompt}\n\n{q}", gold) for q, gold in QUESTIONS])
+        for lang, prompt in LANGUAGE_PROMPTS.items()
+    ]
+    for label, queries in cases:
+        runs = [run(retriever, queries, args.k) for _ in range(args.repeat)]
+        hit_1, hit_k, _ = runs[0]
+        latency = min(r[2] for r in runs)
+        print(f"{label:<38} {hit_1:6.2f} {hit_k:6.2f} {latency:9.2f}")
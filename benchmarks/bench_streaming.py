@@ -0,0 +1,69 @@
+"""Renders and bytes re-sent by StreamHandler, per token versus throttled.
+
+Feeds a synthetic answer (a fee table followed by prose) to StreamHandler
+at a fixed token rate through a fake container that counts what would go
+over the websocket, once with `flush_interval=0` (the old render-per-token
+behaviour) and once per throttling setting. The final text must be the
+same in every case.
+
+    python benchmarks/bench_streaming.py --tokens 500 --rate 60
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from streaming import StreamHandler
+
+
+class CountingContainer:
+    def __init__(self):
+        self.renders = 0
+        self.bytes = 0
+        self.text = ""
+
+    def markdown(self, text):
+        self.renders += 1
+        self.bytes += len(text.encode())
+        self.text = text
+
+
+def answer_tokens(n):
+    rows = ["| Fee head | Merit | Management |\n", "|---|---|---|\n"]
+    rows += [f"| Item {i} | Rs. {1000 + 37 * i:,} | Rs. {2000 + 41 * i:,} |\n" for i in range(20)]
+    tokens = [piece for row in rows for piece in row.split(" ")]
+    words = "Fees are payable at the accounts section before the start of each semester .".split()
+    while len(tokens) < n:
+        tokens.append(" " + words[len(tokens) % len(words)])
+    return tokens[:n]
+
+
+def stream(tokens, rate, **kwargs):
+    container = CountingContainer()
+    handler = StreamHandler(container, **kwargs)
+    for token in tokens:
+        time.sleep(1 / rate)
+        handler.on_llm_new_token(token)
+    handler.on_llm_end(None)
+    return container, handler.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tokens', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=60, help="tokens per second from the LLM")
+    args = parser.parse_args()
+    tokens = answer_tokens(args.tokens)
+
+    print(f"{args.tokens} tokens at {args.rate:.0f} tokens/s")
+    print(f"{'setting':<28} {'renders':>8} {'KiB sent':>9} {'tokens/s':>9}")
+    settings = [("per token (before)", {"flush_interval": 0})] + [
+        (f"every {interval * 1000:.0f} ms / 400 chars", {"flush_interval": interval})
+        for interval in (0.05, 0.1, 0.25)
+    ]
+    expected = "".join(tokens)
+    for label, kwargs in settings:
+        container, stats = stream(tokens, args.rate, **kwargs)
+        assert container.text == expected
+        print(f"{label:<28} {container.renders:8d} {container.bytes / 1024:9.1f} {stats['tokens_per_second']:9.1f}")
@@ -0,0 +1,130 @@
+"""Recall, memory and cold start of the document index's vector formats.
+
+Builds a store of synthetic 384-d unit vectors (clustered like sentence
+embeddings) in each format and compares it to exact float32 search:
+recall@k, size on disk, cold-start time, private resident memory added by
+opening the store, and query latency. Each format is measured in a fresh
+subprocess so memory numbers do not leak between runs. Then, for the
+compact formats, it appends a small segment and compacts `--compactions`
+times, and reports how far the searched codes of the original vectors
+have drifted from them after the first and the last compaction.
+
+    python benchmarks/bench_vectors.py --vectors 50000 --k 4 --compactions 12
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index_manager import FaissSegment, ResidentIndex, SegmentStore, VECTOR_FORMATS
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+
+DIM = 384
+
+
+def make_vectors(n, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, n // 200), DIM))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.normal(size=(n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def private_rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1])
+    return 0
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def build(path, vectors, vector_format, chunk_size=600):
+    texts = [f"chunk {i} " + "x" * chunk_size for i in range(len(vectors))]
+    index = FAISS.from_embeddings(zip(texts, vectors), FakeEmbeddings(size=DIM),
+                                  metadatas=[{"source": "bench.pdf", "page": i} for i in range(len(vectors))])
+    ResidentIndex(path, FakeEmbeddings(size=DIM), vector_format=vector_format).append(index)
+
+
+def measure(path, queries, k):
+    """Runs in a subprocess: open the store, search, report as JSON"""
+    before = private_rss_kb()
+    started = time.perf_counter()
+    segments = ResidentIndex(path, FakeEmbeddings(size=DIM)).get()
+    cold_start = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hits = []
+    for query in queries:
+        found = segments.candidates(query, k)
+        hits.append([segment.document(i).metadata["page"] for _, segment, i in found])
+    latency = (time.perf_counter() - started) / len(queries)
+    return {"cold_start": cold_start, "latency": latency, "rss_kb": private_rss_kb() - before, "hits": hits}
+
+
+def compaction_drift(path, vectors, vector_format, compactions):
+    """Mean absolute error of the original vectors' codes after the first and the last compaction"""
+    embedding = FakeEmbeddings(size=DIM)
+    store = SegmentStore(path, embedding, vector_format)
+    store.append(FaissSegment(FAISS.from_embeddings(zip(map(str, range(len(vectors))), vectors), embedding)))
+    errors = []
+    for i in range(compactions):
+        added = make_vectors(max(1, len(vectors) // 100), seed=100 + i)
+        store.append(FaissSegment(FAISS.from_embeddings(zip(map(str, range(len(added))), added), embedding)))
+        _, name = store.compact()
+        codes = store.load_segment(name).index.reconstruct_n(0, len(vectors))
+        errors.append(float(np.abs(codes - vectors).mean()))
+    return errors[0], errors[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vectors', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--compactions', type=int, default=12)
+    parser.add_argument('--measure', nargs=2, metavar=('PATH', 'QUERIES'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure[0], np.load(args.measure[1]), args.k)))
+        sys.exit()
+
+    vectors = make_vectors(args.vectors, seed=0)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(len(vectors), size=args.queries)] + 0.3 * rng.normal(size=(args.queries, DIM)) / np.sqrt(DIM)
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    distances = (vectors ** 2).sum(axis=1)[None, :] - 2 * queries @ vectors.T
+    exact = [set(row) for row in np.argsort(distances, axis=1)[:, :args.k]]
+
+    print(f"{args.vectors} vectors x {DIM} dims, {args.queries} queries, recall@{args.k} against exact float32")
+    with tempfile.TemporaryDirectory() as tmp:
+        query_path = os.path.join(tmp, "queries.npy")
+        np.save(query_path, queries)
+        for vector_format in VECTOR_FORMATS:
+            path = os.path.join(tmp, vector_format)
+            build(path, vectors, vector_format)
+            out = subprocess.run(
+                [sys.executable, __file__, '--k', str(args.k), '--measure', path, query_path],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            recall = np.mean([len(exact[q] & set(hits)) / args.k for q, hits in enumerate(result["hits"])])
+            print(f"{vector_format:<8} recall {recall:6.4f}  disk {dir_size(path) / 2**20:7.1f} MiB  "
+                  f"cold start {result['cold_start'] * 1000:7.1f} ms  "
+                  f"private RSS +{result['rss_kb'] / 1024:6.1f} MiB  "
+                  f"query {result['latency'] * 1000:6.2f} ms")
+
+        print(f"\ncode drift of the original vectors over {args.compactions} compactions (mean absolute error)")
+        for vector_format in VECTOR_FORMATS[1:]:
+            first, last = compaction_drift(os.path.join(tmp, f"drift-{vector_format}"), vectors, vector_format,
+                                           args.compactions)
+            print(f"{vector_format:<8} after 1 {first:.2e}  after {args.compactions} {last:.2e}")
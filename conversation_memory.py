@@ -0,0 +1,145 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import PrivateAttr
+from streamlit.logger import get_logger
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.caches import BaseCache  # noqa: F401, resolved by model_rebuild
+from langchain_core.callbacks import Callbacks  # noqa: F401, resolved by model_rebuild
+from langchain_core.messages import AIMessage, HumanMessage, get_buffer_string, messages_from_dict, messages_to_dict
+
+# summaries for every session are written here, never on a request's thread
+SUMMARY_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="summary")
+logger = get_logger('Langchain-Chatbot')
+
+
+class BudgetedSummaryMemory(ConversationSummaryBufferMemory):
+    """Recent turns verbatim plus a running summary, within `max_token_limit` tokens.
+
+    After each turn the oldest messages are moved out of the buffer until
+    the summary and the remaining messages fit the budget, so the history
+    sent to the LLM stops growing with the conversation. The moved
+    messages are folded into the summary by SUMMARY_EXECUTOR while the
+    user reads the answer; until that finishes (usually before the next
+    question) they are left out of the prompt. `stats` compares the
+    history the chain gets with the verbatim history it replaced.
+    """
+
+    max_token_limit: int = 1000
+    _lock = PrivateAttr(default_factory=threading.Lock)
+    _summarizing = PrivateAttr(default_factory=threading.Lock)
+    _pending = PrivateAttr(default_factory=list)
+    _verbatim_tokens = PrivateAttr(default=0)
+    _summarized = PrivateAttr(default=0)
+
+    def history_messages(self):
+        messages = list(self.chat_memory.messages)
+        if self.moving_summary_buffer:
+            messages.insert(0, self.summary_message_cls(content=self.moving_summary_buffer))
+        return messages
+
+    def load_memory_variables(self, inputs):
+        with self._lock:
+            messages = self.history_messages()
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {
+            self.memory_key: get_buffer_string(messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        }
+
+    def save_context(self, inputs, outputs):
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        turn = [HumanMessage(content=input_str), AIMessage(content=output_str)]
+        tokens = self.llm.get_num_tokens_from_messages(turn)
+        with self._lock:
+            self.chat_memory.add_messages(turn)
+            self._verbatim_tokens += tokens
+        self.prune()
+
+    def prune(self):
+        """Move the oldest messages out of the budget and summarize them in the background"""
+        with self._lock:
+            buffer = self.chat_memory.messages
+            budget = self.max_token_limit - self.llm.get_num_tokens(self.moving_summary_buffer)
+            pruned = []
+            while buffer and self.llm.get_num_tokens_from_messages(buffer) > budget:
+                pruned.append(buffer.pop(0))
+            if not pruned:
+                return
+            self._pending.extend(pruned)
+        SUMMARY_EXECUTOR.submit(self.summarize_pending)
+
+    def summarize_pending(self):
+        # one summary update per memory at a time, each starting from the last one
+        with self._summarizing:
+            with self._lock:
+                messages, self._pending = self._pending, []
+                summary = self.moving_summary_buffer
+            if not messages:
+                return
+            try:
+                summary = self.predict_new_summary(messages, summary)
+            except Exception as e:
+                logger.warning(f"Summary update failed, will retry on the next turn: {e}")
+                with self._lock:
+                    self._pending[:0] = messages
+                return
+            with self._lock:
+                self.moving_summary_buffer = summary
+                self._summarized += len(messages)
+        # a longer summary leaves less room for verbatim turns
+        self.prune()
+
+    def seed(self, turns):
+        """Start from earlier (question, answer) turns, e.g. a session's displayed messages"""
+        messages = [message for question, answer in turns
+                    for message in (HumanMessage(content=question), AIMessage(content=answer))]
+        if not messages:
+            return
+        with self._lock:
+            self.chat_memory.add_messages(messages)
+            self._verbatim_tokens += self.llm.get_num_tokens_from_messages(messages)
+        self.prune()
+
+    def state(self):
+        """JSON-serializable snapshot; messages still waiting for the summary are kept verbatim"""
+        with self._lock:
+            return {
+                "summary": self.moving_summary_buffer,
+                "messages": messages_to_dict(self._pending + self.chat_memory.messages),
+                "verbatim_tokens": self._verbatim_tokens,
+                "summarized": self._summarized
+            }
+
+    def restore(self, state):
+        with self._lock:
+            self.chat_memory.clear()
+            self.chat_memory.add_messages(messages_from_dict(state["messages"]))
+            self.moving_summary_buffer = state["summary"]
+            self._pending = []
+            self._verbatim_tokens = state["verbatim_tokens"]
+            self._summarized = state["summarized"]
+        self.prune()
+
+    def stats(self):
+        with self._lock:
+            messages = self.history_messages()
+            verbatim_tokens = self._verbatim_tokens
+            pending, summarized = len(self._pending), self._summarized
+        history_tokens = self.llm.get_num_tokens_from_messages(messages) if messages else 0
+        return {
+            "history_tokens": history_tokens,
+            "verbatim_tokens": verbatim_tokens,
+            "tokens_saved": max(verbatim_tokens - history_tokens, 0),
+            "summarized_messages": summarized,
+            "pending_messages": pending
+        }
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._pending = []
+            self._verbatim_tokens = 0
+            self._summarized = 0
+
+
+BudgetedSummaryMemory.model_rebuild()
@@ -0,0 +1,261 @@
+import time
+import threading
+import requests
+import validators
+from collections import deque
+from dataclasses import dataclass
+from urllib.parse import urlsplit, urljoin, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from bs4 import BeautifulSoup
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second.
+
+    Holds at most `capacity` tokens so an idle host can absorb a short burst
+    without ever exceeding the long-run request rate.
+    """
+
+    def __init__(self, rate, capacity=1.0):
+        self.rate = float(rate)
+        self.capacity = max(float(capacity), 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_for = (1 - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+@dataclass
+class CrawledPage:
+    url: str
+    html: str
+    not_modified: bool = False
+
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonical_host(url):
+    """Lower-cased host without `www.` or a default port"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+    return host
+
+
+def canonical_url(url):
+    """Canonical key for a URL, used to tell whether two links are the same page.
+
+    The scheme is dropped (http and https collapse to one page), the host is
+    normalized by `canonical_host`, the trailing slash and fragment are removed
+    and query parameters are sorted. The result is a scheme-relative
+    reference such as `//vjcet.org/about?a=1&b=2`; it is a key, not
+    something to fetch.
+    """
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"//{canonical_host(url)}{path}" + (f"?{query}" if query else "")
+
+
+def is_same_domain(base_url, check_url):
+    return canonical_host(base_url) == canonical_host(check_url)
+
+
+class Frontier:
+    """FIFO crawl frontier with constant-time dedupe on canonical URLs.
+
+    A URL is accepted at most once per crawl: `add` ignores anything whose
+    canonical form has already been queued or visited.
+    """
+
+    def __init__(self, urls=()):
+        self.queue = deque()
+        self.seen = set()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url):
+        key = canonical_url(url)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.queue.append(url)
+        return True
+
+    def mark_seen(self, url):
+        self.seen.add(canonical_url(url))
+
+    def pop(self):
+        return self.queue.popleft()
+
+    def __contains__(self, url):
+        return canonical_url(url) in self.seen
+
+    def __len__(self):
+        return len(self.queue)
+
+
+def extract_links(html, page_url, base_url):
+    """Yield absolute same-domain links found in an HTML page"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for link in soup.find_all('a', href=True):
+        href = link['href'].split('#')[0].strip()
+        if href and not href.startswith(('mailto:', 'tel:', 'javascript:')):
+            full_url = urljoin(page_url, href)
+            if validators.url(full_url) and is_same_domain(base_url, full_url):
+                yield full_url
+
+
+class Crawler:
+    """Concurrent same-domain crawler with per-host politeness.
+
+    Pages are fetched on a bounded thread pool. Each host gets a semaphore
+    capping its in-flight requests and a token bucket capping its request
+    rate; everything else (link discovery, bookkeeping, reporting) happens on
+    the calling thread so callers can safely touch Streamlit from `report`.
+
+    With an `HttpCache`, requests are revalidated and pages answered with a
+    304 come back with `not_modified` set and their cached links reused.
+    """
+
+    def __init__(self, session, max_workers=8, per_host=4, rate=4.0, burst=None,
+                 timeout=20, max_retries=2, cache=None):
+        self.session = session
+        self.cache = cache
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst if burst is not None else per_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hosts = {}
+        self.hosts_lock = threading.Lock()
+        self.elapsed = 0.0
+        self.pages_crawled = 0
+        # pages of the last crawl served from the cache after a 304
+        self.pages_unchanged = 0
+        # outcome of the last crawl, used to detect pages that disappeared
+        self.gone = []
+        self.failed = []
+        self.complete = False
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def pages_per_second(self):
+        return self.pages_crawled / self.elapsed if self.elapsed else 0.0
+
+    def host_limits(self, url):
+        host = canonical_host(url)
+        with self.hosts_lock:
+            if host not in self.hosts:
+                self.hosts[host] = (
+                    threading.Semaphore(self.per_host),
+                    TokenBucket(self.rate, self.burst)
+                )
+            return self.hosts[host]
+
+    def fetch(self, url):
+        """Fetch a URL on a worker thread. Returns (url, response, error)."""
+        semaphore, bucket = self.host_limits(url)
+        with semaphore:
+            for attempt in range(self.max_retries + 1):
+                bucket.acquire()
+                try:
+                    if self.cache is not None:
+                        return url, self.cache.get(self.session, url, timeout=self.timeout), None
+                    return url, self.session.get(url, timeout=self.timeout), None
+                except requests.RequestException as e:
+                    if attempt == self.max_retries:
+                        return url, None, e
+                    time.sleep((attempt + 1) / self.rate)
+
+    def crawl(self, base_url, max_pages=20, report=None):
+        """Breadth-first crawl from `base_url`, returning up to `max_pages` HTML pages.
+
+        Args:
+            base_url (str): page to start from; only links on its host are followed
+            max_pages (int): number of HTML pages to collect
+            report (callable): optional `report(level, message)` hook with level
+                one of "info", "warning" or "error"
+        """
+        report = report or (lambda level, message: None)
+        frontier = Frontier([base_url])
+        pages = []
+        crawled = set()
+        pending = set()
+        self.gone, self.failed = [], []
+        started = time.monotonic()
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while (frontier or pending) and len(pages) < max_pages:
+                # never keep more requests in flight than pages still needed
+                while (frontier and len(pending) < self.max_workers and
+                       len(pages) + len(pending) < max_pages):
+                    pending.add(pool.submit(self.fetch, frontier.pop()))
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, response, error = future.result()
+                    if error is not None:
+                        self.failed.append(url)
+                        report("error", f"Failed to fetch {url} after {self.max_retries} retries: {error}")
+                        continue
+                    if response.status_code != 200:
+                        (self.gone if response.status_code in (404, 410) else self.failed).append(url)
+                        report("warning", f"HTTP {response.status_code} at {url}")
+                        continue
+                    if 'text/html' not in response.headers.get('Content-Type', ''):
+                        report("warning", f"Skipping non-HTML content at {url}")
+                        continue
+                    if len(pages) >= max_pages:
+                        continue
+                    # two links can redirect to the same page; keep it once
+                    final_key = canonical_url(response.url or url)
+                    if final_key in crawled:
+                        continue
+                    crawled.add(final_key)
+                    frontier.mark_seen(response.url or url)
+
+                    not_modified = getattr(response, 'not_modified', False)
+                    pages.append(CrawledPage(url=url, html=response.text, not_modified=not_modified))
+                    report("info", f"{'♻️ Unchanged' if not_modified else '🌐 Crawling'}: {url}")
+
+                    try:
+                        if not_modified:
+                            links = response.links
+                        else:
+                            links = list(extract_links(response.text, url, base_url))
+                            if self.cache is not None:
+                                self.cache.store(url, response, links)
+                        for link in links:
+                            frontier.add(link)
+                    except Exception as e:
+                        report("error", f"Error parsing {url}: {str(e)}")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        # every reachable page was visited, so anything else has vanished
+        self.complete = not frontier and not pending
+        self.elapsed = time.monotonic() - started
+        self.pages_crawled = len(pages)
+        self.pages_unchanged = sum(page.not_modified for page in pages)
+        return pages
@@ -0,0 +1,156 @@
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from array import array
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Disk-backed, content-addressed cache in front of an embedding model.
+
+    Vectors are stored in SQLite keyed by (model name, kind, sha256 of the
+    text), so any text embedded once by any page is never embedded again.
+    The cache holds at most `max_entries` vectors and evicts the least
+    recently used ones beyond that. The last `recent_queries` query vectors
+    are also kept in memory, so the answer cache and the retrievers working
+    on one question share a single lookup. Callers asking for a query that
+    is already being embedded wait for that one model call, since the
+    answer cache and retrieval embed a new question at the same time.
+    """
+
+    def __init__(self, embeddings, model_name, path="embedding_cache.db", max_entries=200_000, recent_queries=256):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.recent_queries = recent_queries
+        self.recent = OrderedDict()
+        # query key -> Future of the vector being computed for it
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.conn.commit()
+        self.entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, text, kind):
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def lookup(self, keys):
+        found = {}
+        with self.lock:
+            # stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                found.update((key, array('f', vector).tolist()) for key, vector in rows)
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self.conn.commit()
+        return found
+
+    def store(self, items):
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(key, array('f', vector).tobytes(), now) for key, vector in items]
+            )
+            self.entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            excess = self.entries - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self.entries -= excess
+                self.evictions += excess
+            self.conn.commit()
+
+    def embed_documents(self, texts):
+        keys = [self.key(text, "doc") for text in texts]
+        cached = self.lookup(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        n_missing = sum(1 for key in keys if key not in cached)
+        self.hits += len(keys) - n_missing
+        self.misses += n_missing
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            # round through float32 so a vector is identical whether or not it was cached
+            computed = {key: array('f', vector).tolist() for key, vector in zip(missing.keys(), vectors)}
+            self.store(list(computed.items()))
+            cached.update(computed)
+        return [list(cached[key]) for key in keys]
+
+    def embed_query(self, text):
+        key = self.key(text, "query")
+        with self.lock:
+            vector = self.recent.get(key)
+            if vector is not None:
+                self.recent.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+            waiting = self.in_flight.get(key)
+            if waiting is None:
+                future = self.in_flight[key] = Future()
+        if waiting is not None:
+            vector = waiting.result()
+            self.hits += 1
+            return list(vector)
+
+        try:
+            cached = self.lookup([key])
+            if key in cached:
+                self.hits += 1
+                vector = cached[key]
+            else:
+                self.misses += 1
+                vector = array('f', self.embeddings.embed_query(text)).tolist()
+                self.store([(key, vector)])
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            self.recent[key] = vector
+            if len(self.recent) > self.recent_queries:
+                self.recent.popitem(last=False)
+            del self.in_flight[key]
+        future.set_result(vector)
+        return list(vector)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self.entries,
+            "evictions": self.evictions
+        }
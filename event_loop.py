@@ -0,0 +1,23 @@
+import asyncio
+import threading
+
+
+class EventLoopThread:
+    """One asyncio event loop, run by a daemon thread for the life of the process.
+
+    The shared ChatOpenAI clients keep async connections that belong to
+    the loop that opened them. An `asyncio.run` per rerun would start a
+    new loop each turn, so the next request would pick a pooled connection
+    whose loop is closed, fail with "Event loop is closed" and be retried
+    after a backoff, sending (and billing) the request twice. Every
+    coroutine submitted here runs on the same loop instead. `submit`
+    returns a concurrent.futures.Future; cancelling it cancels the task.
+    """
+
+    def __init__(self, name="event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
@@ -0,0 +1,269 @@
+import os
+import re
+import hashlib
+import threading
+import multiprocessing
+import docx2txt
+from pypdf import PdfReader
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import Future, ProcessPoolExecutor
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
+
+# elements that never carry page content worth embedding
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'form',
+             'nav', 'header', 'footer', 'aside', 'button', 'select'}
+HEADINGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+BLOCK_TAGS = {'p', 'div', 'section', 'article', 'main', 'blockquote', 'dd', 'dt',
+              'figcaption', 'address', 'br', 'hr'}
+
+
+def clean_text(text):
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def table_to_markdown(table):
+    rows = []
+    for tr in table.find_all('tr'):
+        cells = [clean_text(cell.get_text(' ')).replace('|', '\\|') for cell in tr.find_all(['th', 'td'])]
+        if any(cells):
+            rows.append(cells)
+    if not rows:
+        return ''
+    width = max(len(row) for row in rows)
+    rows = [row + [''] * (width - len(row)) for row in rows]
+    lines = ['| ' + ' | '.join(rows[0]) + ' |', '|' + ' --- |' * width]
+    lines += ['| ' + ' | '.join(row) + ' |' for row in rows[1:]]
+    return '\n'.join(lines)
+
+
+def render_blocks(node, blocks, inline):
+    """Walk `node`, appending finished markdown blocks to `blocks`.
+
+    `inline` collects text of the block currently being built; it is flushed
+    whenever a block-level element starts or ends.
+    """
+    def flush():
+        text = clean_text(''.join(inline))
+        if text:
+            blocks.append(text)
+        inline.clear()
+
+    for child in node.children:
+        if isinstance(child, NavigableString):
+            # comments, doctypes and CDATA are not page text
+            if not isinstance(child, PreformattedString):
+                inline.append(str(child))
+            continue
+        if not isinstance(child, Tag) or child.name in SKIP_TAGS:
+            continue
+
+        if child.name in HEADINGS:
+            flush()
+            text = clean_text(child.get_text(' '))
+            if text:
+                blocks.append('#' * HEADINGS[child.name] + ' ' + text)
+        elif child.name == 'table':
+            flush()
+            table = table_to_markdown(child)
+            if table:
+                blocks.append(table)
+        elif child.name == 'li':
+            flush()
+            text = clean_text(child.get_text(' '))
+            if text:
+                blocks.append('- ' + text)
+        elif child.name == 'pre':
+            flush()
+            blocks.append('```\n' + child.get_text().strip('\n') + '\n```')
+        elif child.name == 'a' and child.get('href', '').startswith(('http://', 'https://')):
+            text = clean_text(child.get_text(' '))
+            inline.append(f" [{text}]({child['href']}) " if text else ' ')
+        elif child.name in BLOCK_TAGS:
+            flush()
+            render_blocks(child, blocks, inline)
+            flush()
+        else:
+            render_blocks(child, blocks, inline)
+    return blocks
+
+
+def html_to_markdown(html):
+    """Convert an HTML page to markdown-ish text for chunking.
+
+    Keeps the title, headings, paragraphs, list items and tables, and drops
+    scripts, navigation and other page chrome.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    root = soup.body or soup
+    blocks = []
+    if soup.title and soup.title.string and not root.find('h1'):
+        blocks.append('# ' + clean_text(soup.title.string))
+    inline = []
+    render_blocks(root, blocks, inline)
+    tail = clean_text(''.join(inline))
+    if tail:
+        blocks.append(tail)
+    return '\n\n'.join(blocks)
+
+
+PDF_TYPE = "application/pdf"
+TXT_TYPE = "text/plain"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool():
+    """Process-wide pool for document parsing, started once per server process.
+
+    Workers are spawned rather than forked so they never inherit the locks
+    of Streamlit's server threads.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _parse_pool
+
+
+@dataclass
+class ParsedPage:
+    file_index: int
+    page: int
+    text: str = None
+    error: Exception = None
+
+
+def hash_upload(file, block_size=1 << 20):
+    """sha256 hex digest of an uploaded file, read in fixed-size blocks without writing it anywhere"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(block_size), b''):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def save_upload(file, folder, block_size=1 << 20):
+    """Copy an uploaded file to `folder` in fixed-size blocks, hashing as it goes.
+
+    Returns (path, sha256 hex digest) without ever holding a second copy of
+    the file in memory. The file keeps its base name, so uploads that may
+    share a name each need their own `folder`.
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, os.path.basename(file.name))
+    digest = hashlib.sha256()
+    file.seek(0)
+    with open(path, 'wb') as f:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+            f.write(block)
+    file.seek(0)
+    return path, digest.hexdigest()
+
+
+def release_reader(reader):
+    """Break a pypdf reader's reference cycles so it is freed immediately.
+
+    Parsed objects point back at their reader, so without this a finished
+    reader (and the whole file it holds) lingers until the cyclic GC runs.
+    """
+    reader.resolved_objects.clear()
+    reader.flattened_pages = None
+    reader.stream.close()
+
+
+def count_pdf_pages(path):
+    reader = PdfReader(path)
+    n_pages = len(reader.pages)
+    release_reader(reader)
+    return n_pages
+
+
+def extract_pdf_pages(path, start, stop):
+    reader = PdfReader(path)
+    texts = [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+    release_reader(reader)
+    return texts
+
+
+def extract_text(mime_type, path):
+    if mime_type == TXT_TYPE:
+        with open(path, encoding="utf-8") as f:
+            return [f.read()]
+    if mime_type == DOCX_TYPE:
+        return [docx2txt.process(path)]
+    return []
+
+
+def raise_error(error):
+    raise error
+
+
+def run_inline(fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def iter_document_pages(files, parallel=True, pages_per_task=16, max_in_flight=None):
+    """Yield the pages of saved documents in order, parsing ahead in a process pool.
+
+    Args:
+        files (list): (name, mime_type, path) tuples
+        parallel (bool): use the shared process pool; False parses inline on
+            the calling thread
+        pages_per_task (int): PDFs are parsed in page ranges of this size, so
+            pages of one large PDF are extracted in parallel
+        max_in_flight (int): parse tasks submitted ahead of the consumer;
+            bounds memory to a few page ranges however large the files are
+
+    Yields:
+        ParsedPage: one per PDF page (0-based `page`) or per TXT/DOCX file.
+        A file or page range that fails to parse yields a page with `error` set.
+    """
+    submit = get_parse_pool().submit if parallel else run_inline
+    max_in_flight = max_in_flight or 2 * (os.cpu_count() or 1)
+
+    def tasks():
+        for index, (name, mime_type, path) in enumerate(files):
+            if mime_type != PDF_TYPE:
+                yield index, 0, submit(extract_text, mime_type, path)
+                continue
+            try:
+                n_pages = count_pdf_pages(path)
+            except Exception as e:
+                yield index, 0, run_inline(raise_error, e)
+                continue
+            for start in range(0, n_pages, pages_per_task):
+                yield index, start, submit(extract_pdf_pages, path, start, min(n_pages, start + pages_per_task))
+
+    def drain(in_flight):
+        index, first_page, future = in_flight.popleft()
+        try:
+            texts = future.result()
+        except Exception as e:
+            yield ParsedPage(index, first_page, error=e)
+            return
+        for offset, text in enumerate(texts):
+            yield ParsedPage(index, first_page + offset, text)
+
+    in_flight = deque()
+    # tasks() is lazy, so nothing is submitted until there is room in flight
+    for task in tasks():
+        in_flight.append(task)
+        if len(in_flight) >= max_in_flight:
+            yield from drain(in_flight)
+    while in_flight:
+        yield from drain(in_flight)
+
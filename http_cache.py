@@ -0,0 +1,116 @@
+import json
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from crawler import canonical_url
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status_code: int
+    headers: dict
+    text: str
+    not_modified: bool = False
+    links: list = field(default_factory=list)
+
+
+class HttpCache:
+    """Persistent HTTP response cache with conditional revalidation.
+
+    Entries are keyed by canonical URL and keep the body, ETag,
+    Last-Modified and fetch time. `get` sends If-None-Match /
+    If-Modified-Since for known URLs and serves the stored body when the
+    server answers 304, flagging the result as `not_modified` so callers can
+    skip extraction and embedding. Links discovered on a page are stored with
+    it so a 304 does not require re-parsing the HTML either.
+    """
+
+    def __init__(self, path="http_cache.db"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                url_key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                body TEXT NOT NULL,
+                links TEXT NOT NULL DEFAULT '[]',
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, url):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT url, content_type, etag, last_modified, body, links FROM responses WHERE url_key = ?",
+                (canonical_url(url),)
+            ).fetchone()
+
+    def get(self, session, url, **kwargs):
+        """GET `url` through `session`, revalidating any cached copy"""
+        entry = self.lookup(url)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry:
+            _, _, etag, last_modified, _, _ = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry:
+            cached_url, content_type, _, _, body, links = entry
+            with self.lock:
+                self.hits += 1
+                self.conn.execute(
+                    "UPDATE responses SET fetched_at = ? WHERE url_key = ?",
+                    (time.time(), canonical_url(url))
+                )
+                self.conn.commit()
+            return CachedResponse(
+                url=cached_url,
+                status_code=200,
+                headers={'Content-Type': content_type or ''},
+                text=body,
+                not_modified=True,
+                links=json.loads(links)
+            )
+
+        with self.lock:
+            self.misses += 1
+        return CachedResponse(
+            url=response.url or url,
+            status_code=response.status_code,
+            headers=response.headers,
+            text=response.text
+        )
+
+    def store(self, url, response, links=()):
+        """Remember a 200 response if the server gave us something to revalidate with"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (canonical_url(url), response.url or url, response.headers.get('Content-Type'),
+                 etag, last_modified, response.text, json.dumps(list(links)), time.time())
+            )
+            self.conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
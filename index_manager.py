@@ -0,0 +1,411 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import tempfile
+import threading
+import numpy as np
+from typing import Any
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+from mmr import mmr_select
+
+INDEX_FILES = ("index.faiss", "index.pkl")
+# a store saved as one flat index before segments existed
+LEGACY_SEGMENT = "."
+VECTOR_FORMATS = ("faiss", "float16", "int8")
+
+
+class FaissSegment:
+    """A segment saved by FAISS: the whole index and pickled docstore live in RAM"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.index.ntotal
+
+    def search(self, query, k):
+        """(squared L2 distance, row) pairs of the `k` rows closest to `query`"""
+        scores, ids = self.index.index.search(query[None, :], min(k, len(self)))
+        return [(float(score), int(i)) for score, i in zip(scores[0], ids[0]) if i != -1]
+
+    def vectors_at(self, rows):
+        return self.index.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+    def vectors(self):
+        return self.index.index.reconstruct_n(0, len(self))
+
+    def document(self, i):
+        return self.index.docstore.search(self.index.index_to_docstore_id[i])
+
+    def documents(self):
+        return [self.document(i) for i in range(len(self))]
+
+
+class CompactSegment:
+    """A segment with quantized vectors in a memory-mapped file and chunks in SQLite.
+
+    `vectors.faiss` is a faiss scalar-quantized index (float16, or int8
+    scaled per dimension). It is opened with mmap, so a worker only pays for
+    the pages it scans, and the OS shares them between worker processes.
+    Chunk texts are read from `chunks.db` for the hits only. An int8
+    segment also keeps its vectors as float16 in `vectors.f16.npy`, which
+    only compaction reads: re-encoding the int8 codes themselves would
+    lose precision again on every compaction.
+    """
+
+    def __init__(self, path):
+        faiss = dependable_faiss_import()
+        self.path = path
+        # faiss before 1.8 cannot map flat codes and reads them into memory
+        self.index = faiss.read_index(os.path.join(path, "vectors.faiss"), getattr(faiss, "IO_FLAG_MMAP_IFC", 0))
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(path, "chunks.db"), check_same_thread=False)
+
+    @classmethod
+    def write(cls, path, vectors, documents, vector_format):
+        faiss = dependable_faiss_import()
+        quantizer = {"float16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}[vector_format]
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        index = faiss.IndexScalarQuantizer(vectors.shape[1], quantizer, faiss.METRIC_L2)
+        index.train(vectors)
+        index.add(vectors)
+        faiss.write_index(index, os.path.join(path, "vectors.faiss"))
+        if vector_format == "int8":
+            np.save(os.path.join(path, "vectors.f16.npy"), vectors.astype(np.float16))
+
+        conn = sqlite3.connect(os.path.join(path, "chunks.db"))
+        conn.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, id TEXT, page_content TEXT, metadata TEXT)")
+        conn.executemany(
+            "INSERT INTO chunks VALUES (?, ?, ?, ?)",
+            [(i, doc.id, doc.page_content, json.dumps(doc.metadata)) for i, doc in enumerate(documents)]
+        )
+        conn.commit()
+        conn.close()
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def search(self, query, k):
+        """(squared L2 distance, row) pairs of the `k` rows closest to `query`"""
+        scores, ids = self.index.search(query[None, :], min(k, len(self)))
+        return [(float(score), int(i)) for score, i in zip(scores[0], ids[0]) if i != -1]
+
+    def vectors_at(self, rows):
+        return self.index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+    def vectors(self):
+        """Every vector, for rewriting the segment; from the float16 copy where there is one"""
+        source = os.path.join(self.path, "vectors.f16.npy")
+        if os.path.exists(source):
+            return np.load(source).astype(np.float32)
+        return self.index.reconstruct_n(0, len(self))
+
+    def document(self, i):
+        with self.lock:
+            row = self.conn.execute("SELECT id, page_content, metadata FROM chunks WHERE row = ?", (i,)).fetchone()
+        return Document(id=row[0], page_content=row[1], metadata=json.loads(row[2]))
+
+    def documents(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT id, page_content, metadata FROM chunks ORDER BY row").fetchall()
+        return [Document(id=id, page_content=text, metadata=json.loads(metadata)) for id, text, metadata in rows]
+
+
+class SegmentStore:
+    """Vector store on disk as a list of immutable segments.
+
+    Every upload is saved as its own small segment directory and appended to
+    `segments.json`, so writing costs time proportional to the new data
+    only. `compact` merges segments into one. The manifest is replaced
+    atomically, so readers see either the old or the new segment list and
+    never a partial state. New segments are written in `vector_format`:
+    "faiss" or one of the compact mmap formats "float16" and "int8".
+    """
+
+    def __init__(self, path, embedding_model, vector_format="faiss"):
+        if vector_format not in VECTOR_FORMATS:
+            raise ValueError(f"vector_format must be one of {VECTOR_FORMATS}, got {vector_format!r}")
+        self.path = path
+        self.embedding_model = embedding_model
+        self.vector_format = vector_format
+        self.manifest_path = os.path.join(path, "segments.json")
+        self.lock = threading.Lock()
+
+    def stamp(self):
+        """(mtime, size) of the manifest, or None while there is no index"""
+        paths = [self.manifest_path]
+        if not os.path.exists(self.manifest_path):
+            paths = [os.path.join(self.path, name) for name in INDEX_FILES]
+        try:
+            stats = [os.stat(path) for path in paths]
+        except FileNotFoundError:
+            return None
+        return tuple((s.st_mtime_ns, s.st_size) for s in stats)
+
+    def segment_names(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)["segments"]
+        except FileNotFoundError:
+            if all(os.path.exists(os.path.join(self.path, name)) for name in INDEX_FILES):
+                return [LEGACY_SEGMENT]
+            return []
+
+    def write_manifest(self, names):
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"segments": names}, f)
+        os.replace(tmp, self.manifest_path)
+
+    def load_segment(self, name):
+        path = os.path.join(self.path, name)
+        if os.path.exists(os.path.join(path, "vectors.faiss")):
+            return CompactSegment(path)
+        return FaissSegment(
+            FAISS.load_local(path, self.embedding_model, allow_dangerous_deserialization=True)
+        )
+
+    def write_segment(self, segment):
+        """Save `segment` under a fresh name; it is not live until listed in the manifest"""
+        os.makedirs(self.path, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.path, prefix=".tmp-")
+        if self.vector_format == "faiss" and isinstance(segment, FaissSegment):
+            segment.index.save_local(tmp)
+        elif self.vector_format == "faiss":
+            documents = segment.documents()
+            FAISS.from_embeddings(
+                zip([doc.page_content for doc in documents], segment.vectors()),
+                self.embedding_model,
+                metadatas=[doc.metadata for doc in documents],
+                ids=[doc.id or str(uuid.uuid4()) for doc in documents]
+            ).save_local(tmp)
+        else:
+            CompactSegment.write(tmp, segment.vectors(), segment.documents(), self.vector_format)
+        name = f"seg-{time.time_ns()}"
+        os.rename(tmp, os.path.join(self.path, name))
+        return name
+
+    def append(self, segment):
+        """Add `segment` as a new segment, returning its name, the new segment list and its stamp"""
+        name = self.write_segment(segment)
+        with self.lock:
+            names = self.segment_names() + [name]
+            self.write_manifest(names)
+            return name, names, self.stamp()
+
+    def remove_segment(self, name):
+        if name == LEGACY_SEGMENT:
+            for file in INDEX_FILES:
+                os.remove(os.path.join(self.path, file))
+        else:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def compact(self):
+        """Merge all current segments into one, returning (names merged, new name).
+
+        Segments are read fresh from disk and rewritten in the store's
+        current vector format, so compaction also converts old segments.
+        """
+        names = self.segment_names()
+        if len(names) < 2 and not (names and self.needs_conversion(names[0])):
+            return [], None
+        segments = [self.load_segment(name) for name in names]
+        merged = ConcatenatedSegment(segments)
+        merged_name = self.write_segment(merged)
+        with self.lock:
+            # keep anything appended while we were merging
+            self.write_manifest([merged_name] + [n for n in self.segment_names() if n not in names])
+        for name in names:
+            self.remove_segment(name)
+        return names, merged_name
+
+    def needs_conversion(self, name):
+        compact = os.path.exists(os.path.join(self.path, name, "vectors.faiss"))
+        return compact != (self.vector_format != "faiss")
+
+
+class ConcatenatedSegment:
+    """Several segments read back to back, as the input of a compaction"""
+
+    def __init__(self, segments):
+        self.segments = segments
+
+    def vectors(self):
+        return np.concatenate([np.asarray(segment.vectors(), dtype=np.float32) for segment in self.segments])
+
+    def documents(self):
+        return [doc for segment in self.segments for doc in segment.documents()]
+
+
+class SegmentSet:
+    """Segments searched as one index: per-segment top-k, merged by distance"""
+
+    def __init__(self, segments, embedding_model):
+        self.segments = segments
+        self.embedding_model = embedding_model
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments.values())
+
+    def candidates(self, embedding, fetch_k):
+        query = np.asarray(embedding, dtype=np.float32)
+        found = [
+            (score, segment, i)
+            for segment in self.segments.values() if len(segment)
+            for score, i in segment.search(query, fetch_k)
+        ]
+        found.sort(key=lambda c: c[0])
+        return found[:fetch_k]
+
+    def similarity_search(self, query, k=4):
+        embedding = self.embedding_model.embed_query(query)
+        return [segment.document(i) for _, segment, i in self.candidates(embedding, k)]
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5):
+        embedding = self.embedding_model.embed_query(query)
+        found = self.candidates(embedding, fetch_k)
+        if not found:
+            return []
+        # one batched reconstruct per segment rather than one call per candidate
+        matrix = np.empty((len(found), len(embedding)), dtype=np.float32)
+        rows_by_segment = {}
+        for row, (_, segment, i) in enumerate(found):
+            rows_by_segment.setdefault(id(segment), (segment, [], []))
+            rows_by_segment[id(segment)][1].append(row)
+            rows_by_segment[id(segment)][2].append(i)
+        for segment, rows, ids in rows_by_segment.values():
+            matrix[rows] = segment.vectors_at(ids)
+        selected = mmr_select(embedding, matrix, k, lambda_mult)
+        return [found[j][1].document(found[j][2]) for j in selected]
+
+    def as_retriever(self, search_type="similarity", search_kwargs=None):
+        return SegmentRetriever(segments=self, search_type=search_type, search_kwargs=search_kwargs or {})
+
+
+class SegmentRetriever(BaseRetriever):
+    segments: Any
+    search_type: str = "similarity"
+    search_kwargs: dict = {}
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        if self.search_type == "mmr":
+            return self.segments.max_marginal_relevance_search(query, **self.search_kwargs)
+        return self.segments.similarity_search(query, **self.search_kwargs)
+
+
+class ResidentIndex:
+    """A segmented vector store opened once per process and shared by every session.
+
+    `get` returns the loaded segments after a single `os.stat`, so the cost
+    of a query does not depend on how large the index is on disk. When the
+    manifest changes (another process appended, or a compaction finished),
+    only the new segments are loaded, on a background thread. Readers keep
+    the old set until the swap. When there are more than `max_segments`
+    segments, `append` starts a compaction in the background. With a
+    compact `vector_format`, segments are memory-mapped instead of loaded.
+    """
+
+    def __init__(self, path, embedding_model, max_segments=8, vector_format="faiss"):
+        self.store = SegmentStore(path, embedding_model, vector_format)
+        self.embedding_model = embedding_model
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+        self.loading = None
+        self.compacting = False
+        self.loads = 0
+        self.compactions = 0
+
+    def stamp(self):
+        return self.store.stamp()
+
+    def install(self, segments, version):
+        with self.lock:
+            if self.version != version:
+                self.index, self.version = SegmentSet(segments, self.embedding_model), version
+
+    def load(self, version):
+        loaded = self.index.segments if self.index else {}
+        # segments are immutable, so only ones we have not seen are read
+        segments = {
+            name: loaded[name] if name in loaded else self.store.load_segment(name)
+            for name in self.store.segment_names()
+        }
+        # a manifest change while we were reading may have removed a segment
+        if self.stamp() != version:
+            return None
+        with self.lock:
+            self.loads += 1
+        self.install(segments, version)
+        return self.index
+
+    def reload_in_background(self, version):
+        def run():
+            try:
+                self.load(version)
+            except Exception:
+                pass  # keep serving the old segments; the next get() retries
+            finally:
+                with self.lock:
+                    self.loading = None
+
+        with self.lock:
+            if self.loading == version:
+                return
+            self.loading = version
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self):
+        """The current segments, or None if nothing has been saved yet"""
+        version = self.stamp()
+        if version is None:
+            return None
+        with self.lock:
+            index, current = self.index, self.version
+        if current == version:
+            return index
+        if index is None:
+            # nothing to serve in the meantime, so the first load blocks
+            while index is None and version is not None:
+                try:
+                    index = self.load(version)
+                except FileNotFoundError:
+                    pass
+                version = self.stamp()
+            return index
+        self.reload_in_background(version)
+        return index
+
+    def append(self, index):
+        """Save the FAISS `index` as a new segment and serve it right away"""
+        name, names, version = self.store.append(FaissSegment(index))
+        loaded = dict(self.index.segments) if self.index else {}
+        if self.store.vector_format == "faiss":
+            loaded[name] = FaissSegment(index)
+        segments = {name: loaded[name] if name in loaded else self.store.load_segment(name) for name in names}
+        self.install(segments, version)
+        if len(segments) > self.max_segments:
+            self.compact_in_background()
+
+    def compact_in_background(self):
+        def run():
+            try:
+                self.store.compact()
+                with self.lock:
+                    self.compactions += 1
+            finally:
+                with self.lock:
+                    self.compacting = False
+
+        with self.lock:
+            if self.compacting:
+                return
+            self.compacting = True
+        threading.Thread(target=run, daemon=True).start()
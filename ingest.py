@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import hashlib
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class IngestManifest:
+    """Content hashes of everything currently embedded in a vector store.
+
+    For every source (a page URL or "📄 file name") the manifest keeps the hash
+    of the extracted text and the ids of its chunks. Chunk ids are themselves
+    content hashes, so re-ingesting a source tells us exactly which chunks are
+    new and which are stale without touching the vectors of the rest.
+    """
+
+    def __init__(self, path="ingest_manifest.json"):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+
+    def __contains__(self, source):
+        return source in self.entries
+
+    def is_unchanged(self, source, digest):
+        entry = self.entries.get(source)
+        return entry is not None and entry["hash"] == digest
+
+    def sources_for_site(self, site):
+        return [source for source, entry in self.entries.items() if entry.get("site") == site]
+
+    def chunk_ids(self, source, splits):
+        """Yield (id, split) pairs with content-addressed ids, unique within the source"""
+        counts = {}
+        for split in splits:
+            chunk_id = content_hash(f"{source}\n{split.page_content}")
+            counts[chunk_id] = counts.get(chunk_id, 0) + 1
+            yield (chunk_id if counts[chunk_id] == 1 else f"{chunk_id}-{counts[chunk_id]}"), split
+
+    def record(self, source, digest, chunk_ids, site=None):
+        self.entries[source] = {"hash": digest, "chunks": list(chunk_ids), "site": site}
+
+    def forget(self, source):
+        """Drop a source, returning the chunk ids that must be deleted from the store"""
+        return self.entries.pop(source, {}).get("chunks", [])
+
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f)
+
+
+class IngestionJob:
+    """Batches all vector store writes of one ingestion run.
+
+    Sources are queued with `sync_source` / `remove_source`; their new chunks
+    are embedded `batch_size` at a time and written in bulk, and the store and
+    manifest are persisted once per `checkpoint_every` chunks and at `commit`.
+    An optional `lexical_index` receives the same writes under the same ids.
+    """
+
+    def __init__(self, vectordb, manifest, batch_size=256, checkpoint_every=2048, lexical_index=None):
+        self.vectordb = vectordb
+        self.manifest = manifest
+        self.lexical_index = lexical_index
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.pending_docs = []
+        self.pending_ids = []
+        self.pending_deletes = []
+        self.pending_source_deletes = []
+        # chunks written before the manifest existed have random ids and can
+        # only be found by source; they exist if the store holds unrecorded chunks
+        recorded = sum(len(entry["chunks"]) for entry in manifest.entries.values())
+        self.has_unrecorded = vectordb._collection.count() > recorded
+        self.checkpoints = 0
+        self.chunks_written = 0
+        self.chunks_deleted = 0
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    @property
+    def chunks_per_second(self):
+        return self.chunks_written / self.elapsed if self.elapsed else 0.0
+
+    def sync_source(self, source, digest, splits, site=None):
+        """Queue the changes that bring one source in line with its current splits.
+
+        `digest` is the content hash recorded for the source and `splits` may
+        be any iterable, including a generator streaming pages of a large
+        file: only chunk ids are kept per source, and pending chunks are
+        written out whenever a checkpoint fills up. Only chunks whose ids are
+        not already stored are embedded, and chunks the source no longer
+        produces are deleted by id. Returns (added, deleted).
+        """
+        if source in self.manifest:
+            old_ids = set(self.manifest.entries[source]["chunks"])
+        else:
+            if self.has_unrecorded:
+                self.pending_source_deletes.append(source)
+            old_ids = set()
+
+        ids, added = [], 0
+        mark, checkpoints = len(self.pending_docs), self.checkpoints
+        try:
+            for chunk_id, split in self.manifest.chunk_ids(source, splits):
+                ids.append(chunk_id)
+                if chunk_id in old_ids:
+                    continue
+                self.pending_ids.append(chunk_id)
+                self.pending_docs.append(split)
+                added += 1
+                if len(self.pending_docs) >= self.checkpoint_every:
+                    self.checkpoint()
+        except Exception:
+            # drop what is still queued for this source; anything already
+            # written is unrecorded and gets replaced on the next sync
+            if self.checkpoints != checkpoints:
+                mark = 0
+                self.manifest.forget(source)
+            del self.pending_docs[mark:]
+            del self.pending_ids[mark:]
+            raise
+
+        stale = list(old_ids - set(ids))
+        self.pending_deletes.extend(stale)
+        self.manifest.record(source, digest, ids, site)
+        return added, len(stale)
+
+    def remove_source(self, source):
+        stale = self.manifest.forget(source)
+        self.pending_deletes.extend(stale)
+        return len(stale)
+
+    def flush(self):
+        # by source, so before this flush's own chunks of those sources are added
+        if self.pending_source_deletes:
+            self.vectordb.delete(where={"source": {"$in": self.pending_source_deletes}})
+            if self.lexical_index is not None:
+                for source in self.pending_source_deletes:
+                    self.lexical_index.delete_source(source)
+        if self.pending_deletes:
+            self.vectordb.delete(ids=self.pending_deletes)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(self.pending_deletes)
+            self.chunks_deleted += len(self.pending_deletes)
+        for i in range(0, len(self.pending_docs), self.batch_size):
+            self.vectordb.add_documents(
+                self.pending_docs[i:i + self.batch_size],
+                ids=self.pending_ids[i:i + self.batch_size]
+            )
+        if self.lexical_index is not None and self.pending_docs:
+            self.lexical_index.add(self.pending_ids, self.pending_docs)
+        self.chunks_written += len(self.pending_docs)
+        self.pending_docs, self.pending_ids, self.pending_deletes = [], [], []
+        self.pending_source_deletes = []
+        self.elapsed = time.monotonic() - self.started
+
+    def checkpoint(self):
+        self.flush()
+        self.checkpoints += 1
+        if hasattr(self.vectordb, "persist"):
+            self.vectordb.persist()
+        if self.lexical_index is not None:
+            self.lexical_index.commit()
+        # the manifest only ever describes chunks that are safely on disk
+        self.manifest.save()
+
+    def commit(self):
+        self.checkpoint()
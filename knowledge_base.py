@@ -0,0 +1,355 @@
+import os
+import json
+import utils
+import requests
+import tempfile
+import validators
+import streamlit as st
+from itertools import groupby
+from crawler import Crawler, canonical_host, canonical_url
+from extraction import PDF_TYPE, hash_upload, html_to_markdown, iter_document_pages, save_upload
+from ingest import IngestManifest, IngestionJob, content_hash
+from lexical_index import HybridRetriever
+from mmr import ChromaMMRRetriever
+from conversation_memory import BudgetedSummaryMemory
+from langchain.chains import ConversationalRetrievalChain
+from langchain_core.documents.base import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+class KnowledgeBasePage:
+    """Website and document ingestion shared by the pages that chat over the Chroma knowledge base.
+
+    Crawling, refreshing, upload handling, deletion and the QA chain over
+    the store live here once, so the pages cannot drift apart on which
+    pages are re-embedded or removed, or on how they are retrieved.
+    Subclasses set `self.llm` before calling `__init__`.
+    """
+
+    def __init__(self):
+        self.embedding_model = utils.configure_embedding_model()
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
+            'Accept-Language': 'en-US,en;q=0.9'
+        })
+        self.http_cache = utils.configure_http_cache()
+        self.manifest = IngestManifest()
+
+    def setup_vectordb(self):
+        try:
+            return utils.configure_vectordb(self.embedding_model)
+        except Exception as e:
+            st.error(f"VectorDB error: {str(e)}")
+            return None
+
+    def setup_qa_chain(self, answer_prompt=None):
+        """Reuse this session's chain until the store or the LLM settings change"""
+        vectordb = self.setup_vectordb()
+        if not vectordb:
+            return None
+
+        chain_key = f"{type(self).__name__}_qa_chain"
+        version = (utils.store_version(), utils.llm_cache_key(self.llm))
+        cached = st.session_state.get(chain_key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        vector_retriever = ChromaMMRRetriever(
+            vectordb=vectordb,
+            k=5,
+            fetch_k=15,
+            lambda_mult=0.75
+        )
+        # exact tokens (route numbers, course codes, names) are found by BM25
+        retriever = HybridRetriever(
+            vector_retriever=vector_retriever,
+            lexical_index=utils.configure_lexical_index(vectordb),
+            k=5
+        )
+
+        # the conversation survives the chain being rebuilt, and is summarized by the new LLM
+        if cached:
+            memory = cached[1].memory
+            memory.llm = self.llm
+        else:
+            memory = BudgetedSummaryMemory(
+                llm=self.llm,
+                memory_key='chat_history',
+                output_key='answer',
+                return_messages=True
+            )
+
+        qa_chain = ConversationalRetrievalChain.from_llm(
+            llm=self.llm,
+            retriever=retriever,
+            memory=memory,
+            return_source_documents=True,
+            combine_docs_chain_kwargs={"prompt": answer_prompt} if answer_prompt else None,
+            verbose=True
+        )
+        st.session_state[chain_key] = (version, qa_chain)
+        return qa_chain
+
+    def render_sources(self, sources):
+        with st.expander("📚 View Sources"):
+            for idx, doc in enumerate(sources, 1):
+                source = doc.metadata['source']
+                if source.startswith("📄"):
+                    st.markdown(f"**Document {idx}:** {source[2:]}")
+                else:
+                    st.markdown(f"**Website {idx}:** [{source}]({source})")
+                st.caption(doc.page_content[:400] + "...")
+
+    def load_sources(self):
+        if os.path.exists("sources.json"):
+            with open("sources.json", "r") as f:
+                st.session_state["sources"] = json.load(f)
+
+    def save_sources(self):
+        with open("sources.json", "w") as f:
+            json.dump(st.session_state.get("sources", []), f)
+
+    def report_crawl(self, level, message):
+        getattr(st.sidebar, level)(message)
+
+    def crawl_website(self, base_url, max_pages=20, rate=4.0):
+        crawler = Crawler(self.session, rate=rate, cache=self.http_cache)
+        pages = crawler.crawl(base_url, max_pages, report=self.report_crawl)
+        if pages:
+            st.sidebar.info(
+                f"⏱️ Crawled {len(pages)} pages at {crawler.pages_per_second:.1f} pages/s "
+                f"({crawler.pages_unchanged} unchanged, {len(pages) - crawler.pages_unchanged} downloaded)"
+            )
+        return pages, crawler
+
+    def vanished_pages(self, site, pages, crawler):
+        """Previously ingested pages of `site` that a crawl shows no longer exist"""
+        gone = {canonical_url(url) for url in crawler.gone}
+        reached = {canonical_url(url) for url in crawler.failed}
+        reached.update(canonical_url(page.url) for page in pages)
+        vanished = []
+        for source in self.manifest.sources_for_site(site):
+            key = canonical_url(source)
+            # without a complete crawl, only an explicit 404/410 proves a page is gone
+            if key in gone or (crawler.complete and key not in reached):
+                vanished.append(source)
+        return vanished
+
+    def extract_page(self, page, use_reader_proxy=False):
+        """Turn crawled HTML into markdown, optionally retrying thin pages via the reader proxy"""
+        content = html_to_markdown(page.html)
+        if len(content) < 500:
+            if use_reader_proxy:
+                return self.scrape_page(page.url) or content
+            st.warning(f"Page {page.url} contains minimal content - may not be useful")
+        return content
+
+    def scrape_page(self, url):
+        try:
+            proxy_url = f"https://r.jina.ai/{url}"
+            response = self.http_cache.get(self.session, proxy_url, timeout=25)
+            if response.status_code != 200:
+                st.error(f"Proxy error ({response.status_code}) for {url}")
+                return None
+            if not response.not_modified:
+                self.http_cache.store(proxy_url, response)
+            
+            if len(response.text) < 500:
+                st.warning(f"Page {url} contains minimal content - may not be useful")
+                
+            return response.text
+        except Exception as e:
+            st.error(f"Failed to scrape {url}: {str(e)}")
+        return None
+
+    def page_documents(self, file, source, pages):
+        """Yield one Document per parsed page of an uploaded file, reporting parse problems"""
+        for page in pages:
+            if page.error is not None:
+                raise page.error
+            if file.type == PDF_TYPE and not page.text.strip():
+                st.warning(f"Page {page.page+1} in {file.name} appears empty")
+                continue
+            yield Document(
+                page_content=page.text,
+                metadata={"source": source, "page": page.page}
+            )
+
+    def handle_file_upload(self, uploaded_files):
+        if not uploaded_files:
+            return
+
+        progress_bar = st.sidebar.progress(0)
+        status_text = st.sidebar.empty()
+        job = self.start_ingestion_job()
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1500,
+            chunk_overlap=300
+        )
+
+        with tempfile.TemporaryDirectory() as upload_dir:
+            new_files = []
+            for file in uploaded_files:
+                digest = hash_upload(file)
+                if self.manifest.is_unchanged(f"📄 {file.name}", digest):
+                    st.sidebar.info(f"⏭️ Unchanged: {file.name}")
+                    continue
+                # one folder per file, so uploads sharing a name do not overwrite each other
+                path, _ = save_upload(file, os.path.join(upload_dir, str(len(new_files))))
+                new_files.append((file, path, digest))
+
+            # pages stream from the parser pool through the splitter into the job
+            total_files = len(new_files)
+            pages = iter_document_pages([(file.name, file.type, path) for file, path, _ in new_files])
+            for index, file_pages in groupby(pages, key=lambda page: page.file_index):
+                file, _, digest = new_files[index]
+                source = f"📄 {file.name}"
+                status_text.text(f"📄 Processing {index+1}/{total_files}: {file.name}")
+                progress_bar.progress((index+1)/total_files)
+
+                splits = (
+                    split
+                    for doc in self.page_documents(file, source, file_pages)
+                    for split in text_splitter.split_documents([doc])
+                )
+                try:
+                    added, deleted = job.sync_source(source, digest, splits)
+                    if source not in st.session_state.sources:
+                        st.session_state.sources.append(source)
+                    st.sidebar.success(f"✅ Processed: {file.name} (+{added} / -{deleted} chunks)")
+                except Exception as e:
+                    st.sidebar.error(f"❌ Error processing {file.name}: {str(e)}")
+
+        progress_bar.empty()
+        if self.finish_ingestion_job(job):
+            status_text.success("🎉 All files processed!")
+        self.save_sources()
+
+    def start_ingestion_job(self):
+        vectordb = utils.configure_vectordb(self.embedding_model)
+        return IngestionJob(vectordb, self.manifest, lexical_index=utils.configure_lexical_index(vectordb))
+
+    def finish_ingestion_job(self, job):
+        """Write everything queued in `job` to the store and report throughput"""
+        try:
+            job.commit()
+        except Exception as e:
+            st.sidebar.error(f"❌ Error writing to the knowledge base: {str(e)}")
+            return False
+        if job.chunks_written or job.chunks_deleted:
+            utils.bump_store_version()
+            cache_stats = self.embedding_model.stats()
+            st.sidebar.info(
+                f"🧮 Embedded {job.chunks_written} chunks, removed {job.chunks_deleted} "
+                f"in {job.elapsed:.1f}s ({job.chunks_per_second:.1f} chunks/s, "
+                f"embedding cache hit rate {cache_stats['hit_rate']:.0%})"
+            )
+        return True
+
+    def handle_website_input(self, input_urls, max_pages, crawl_rate, use_reader_proxy=False):
+        urls = [url.strip() for url in input_urls.split('\n') if url.strip()]
+        new_urls = []
+        job = self.start_ingestion_job()
+        
+        for url in urls:
+            if not validators.url(url):
+                st.error(f"Invalid URL: {url}")
+                continue
+                
+            if url in st.session_state.get("sources", []):
+                st.warning(f"Already exists: {url}")
+                continue
+                
+            if self.process_website(url, job, max_pages, crawl_rate, use_reader_proxy):
+                new_urls.append(url)
+                st.session_state.sources.append(url)
+
+        if not self.finish_ingestion_job(job):
+            return
+        if new_urls:
+            st.success(f"Added {len(new_urls)} new websites!")
+            self.save_sources()
+
+    def refresh_websites(self, max_pages, crawl_rate, use_reader_proxy=False):
+        """Incrementally re-ingest every website already in the knowledge base"""
+        urls = [source for source in st.session_state.get("sources", []) if not source.startswith("📄")]
+        if not urls:
+            st.warning("No websites to refresh")
+            return
+        job = self.start_ingestion_job()
+        for url in urls:
+            self.process_website(url, job, max_pages, crawl_rate, use_reader_proxy)
+        if self.finish_ingestion_job(job):
+            st.success(f"Refreshed {len(urls)} websites!")
+
+    def process_website(self, url, job, max_pages, crawl_rate, use_reader_proxy=False):
+        pages, crawler = self.crawl_website(url, max_pages, crawl_rate)
+        if not pages:
+            st.error(f"No pages found at {url}")
+            return False
+
+        progress_bar = st.sidebar.progress(0)
+        status_text = st.sidebar.empty()
+        total_pages = len(pages)
+        site = canonical_host(url)
+        unchanged = added = deleted = 0
+
+        for i, page in enumerate(pages):
+            status_text.text(f"🌐 Processing page {i+1}/{total_pages}")
+            progress_bar.progress((i+1)/total_pages)
+
+            # a 304 means the page is unchanged since it was last embedded
+            if page.not_modified and page.url in self.manifest:
+                unchanged += 1
+                continue
+            
+            content = self.extract_page(page, use_reader_proxy)
+            if not content:
+                continue
+            digest = content_hash(content)
+            if self.manifest.is_unchanged(page.url, digest):
+                unchanged += 1
+                continue
+                
+            doc = Document(
+                page_content=content,
+                metadata={"source": page.url}
+            )
+            
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1500,
+                chunk_overlap=300
+            )
+            splits = text_splitter.split_documents([doc])
+            
+            try:
+                page_added, page_deleted = job.sync_source(page.url, digest, splits, site)
+                added += page_added
+                deleted += page_deleted
+            except Exception as e:
+                st.error(f"Error adding {page.url}: {str(e)}")
+
+        for source in self.vanished_pages(site, pages, crawler):
+            deleted += job.remove_source(source)
+
+        progress_bar.empty()
+        status_text.success(
+            f"✅ Finished processing {url}: {unchanged} pages unchanged, "
+            f"+{added} / -{deleted} chunks"
+        )
+        return True
+
+    def clear_all_data(self):
+        st.session_state["sources"] = []
+        # drop the collection through the shared client; deleting its files
+        # from under an open client leaves it pointing at a missing database
+        vectordb = utils.configure_vectordb(self.embedding_model)
+        utils.configure_lexical_index(vectordb).clear()
+        vectordb.delete_collection()
+        utils.bump_store_version()
+        if os.path.exists("sources.json"):
+            os.remove("sources.json")
+        if os.path.exists(self.manifest.path):
+            os.remove(self.manifest.path)
+        st.rerun()
@@ -0,0 +1,182 @@
+import re
+import json
+import asyncio
+import math
+import sqlite3
+import threading
+from collections import Counter
+from typing import Any
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# words, plus codes and names that keep their punctuation: "CS201", "KL-07-B", "B.Tech"
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text):
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if not match.replace('_', '').isalnum():
+            # "kl-07-b" should also match a query for "kl 07 b"
+            tokens.extend(re.split(r"[-./]", match))
+    return tokens
+
+
+class LexicalIndex:
+    """Persistent BM25 inverted index over the same chunks as a vector store.
+
+    Chunks are added and deleted by the ids the vector store uses, so an
+    IngestionJob keeps both in step. Postings live in SQLite clustered by
+    term, so a query reads only the postings of its own terms, each as one
+    contiguous range. Every chunk keeps its term list for deletes.
+    """
+
+    def __init__(self, path="lexical_index.db", k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                source TEXT,
+                length INTEGER NOT NULL,
+                page_content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                terms TEXT NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        self.conn.commit()
+        self.n_chunks, self.total_length = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks"
+        ).fetchone()
+
+    def __len__(self):
+        return self.n_chunks
+
+    def add(self, ids, documents):
+        """Index `documents` under `ids`, replacing any chunk already stored with the same id"""
+        self.delete(ids)
+        chunks, postings = [], []
+        for chunk_id, doc in zip(ids, documents):
+            counts = Counter(tokenize(doc.page_content))
+            length = sum(counts.values())
+            chunks.append((chunk_id, doc.metadata.get("source"), length, doc.page_content,
+                           json.dumps(doc.metadata), json.dumps(list(counts))))
+            postings.extend((term, chunk_id, tf, length) for term, tf in counts.items())
+        # inserting in key order keeps the clustered b-tree appends cheap
+        postings.sort()
+        with self.lock:
+            self.conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?)", chunks)
+            self.conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", postings)
+            self.n_chunks += len(chunks)
+            self.total_length += sum(chunk[2] for chunk in chunks)
+
+    def delete(self, ids):
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                batch = list(ids[i:i + 500])
+                marks = ','.join('?' * len(batch))
+                removed = self.conn.execute(
+                    f"SELECT id, length, terms FROM chunks WHERE id IN ({marks})", batch
+                ).fetchall()
+                if not removed:
+                    continue
+                self.conn.executemany(
+                    "DELETE FROM postings WHERE term = ? AND chunk_id = ?",
+                    [(term, chunk_id) for chunk_id, _, terms in removed for term in json.loads(terms)]
+                )
+                self.conn.execute(f"DELETE FROM chunks WHERE id IN ({marks})", batch)
+                self.n_chunks -= len(removed)
+                self.total_length -= sum(length for _, length, _ in removed)
+
+    def delete_source(self, source):
+        with self.lock:
+            ids = [row[0] for row in self.conn.execute("SELECT id FROM chunks WHERE source = ?", (source,))]
+        self.delete(ids)
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM postings")
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.commit()
+            self.n_chunks, self.total_length = 0, 0
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def search(self, query, k=15):
+        """Top `k` (Document, BM25 score) pairs for `query`"""
+        terms = set(tokenize(query))
+        if not terms or not self.n_chunks:
+            return []
+        avg_length = self.total_length / self.n_chunks
+        scores = Counter()
+        with self.lock:
+            for term in terms:
+                postings = self.conn.execute(
+                    "SELECT chunk_id, tf, length FROM postings WHERE term = ?", (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (self.n_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            top = scores.most_common(k)
+            rows = {
+                row[0]: row for row in self.conn.execute(
+                    f"SELECT id, page_content, metadata FROM chunks WHERE id IN ({','.join('?' * len(top))})",
+                    [chunk_id for chunk_id, _ in top]
+                )
+            } if top else {}
+        return [
+            (Document(id=chunk_id, page_content=rows[chunk_id][1], metadata=json.loads(rows[chunk_id][2])), score)
+            for chunk_id, score in top if chunk_id in rows
+        ]
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    """Merge ranked Document lists; a chunk is identified by its source and text"""
+    scores, docs = Counter(), {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = (doc.metadata.get("source"), doc.page_content)
+            scores[key] += 1 / (rrf_k + rank + 1)
+            docs.setdefault(key, doc)
+    return [docs[key] for key, _ in scores.most_common(k)]
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense retriever results fused with BM25 hits by reciprocal rank fusion"""
+
+    vector_retriever: Any
+    lexical_index: Any
+    k: int = 5
+    lexical_k: int = 15
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        dense = self.vector_retriever.invoke(query)
+        lexical = [doc for doc, _ in self.lexical_index.search(query, self.lexical_k)]
+        return reciprocal_rank_fusion([dense, lexical], self.k, self.rrf_k)
+
+    async def _aget_relevant_documents(self, query, *, run_manager):
+        # the dense and BM25 searches are independent, so they run side by side
+        dense, lexical = await asyncio.gather(
+            self.vector_retriever.ainvoke(query),
+            asyncio.to_thread(self.lexical_index.search, query, self.lexical_k)
+        )
+        return reciprocal_rank_fusion([dense, [doc for doc, _ in lexical]], self.k, self.rrf_k)
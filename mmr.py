@@ -0,0 +1,73 @@
+import numpy as np
+from typing import Any
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    # zero vectors stay zero, which makes their cosine similarity 0 as in langchain
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def mmr_select(query_embedding, candidates, k=4, lambda_mult=0.5, normalized=False):
+    """Indices of `k` candidates chosen by maximal marginal relevance, in selection order.
+
+    Picks the same candidates as langchain's `maximal_marginal_relevance`,
+    but on a unit-normalized candidate matrix: each step costs one
+    matrix-vector product to update every candidate's similarity to the
+    closest selected one, instead of recomputing all pairwise similarities
+    and scanning them in Python. Pass `normalized=True` when `candidates`
+    rows are already unit length.
+    """
+    n = min(k, len(candidates))
+    if n <= 0:
+        return []
+    if not normalized:
+        candidates = normalize_rows(candidates)
+    relevance = candidates @ normalize_rows(query_embedding).ravel()
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+
+    selected = [int(np.argmax(relevance))]
+    available[selected[0]] = False
+    while len(selected) < n:
+        np.maximum(redundancy, candidates @ candidates[selected[-1]], out=redundancy)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+    return selected
+
+
+class ChromaMMRRetriever(BaseRetriever):
+    """MMR over a Chroma collection with `mmr_select`.
+
+    Fetches the `fetch_k` nearest chunks with their embeddings in one query
+    and returns the `k` selected ones in rank order, as Chroma's own MMR
+    search does.
+    """
+
+    vectordb: Any
+    k: int = 4
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        embedding = self.vectordb.embeddings.embed_query(query)
+        collection = self.vectordb._collection
+        n_results = min(self.fetch_k, collection.count())
+        if not n_results:
+            return []
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            include=["metadatas", "documents", "embeddings"]
+        )
+        selected = mmr_select(embedding, results["embeddings"][0], self.k, self.lambda_mult)
+        return [
+            Document(page_content=results["documents"][0][i], metadata=results["metadatas"][0][i] or {})
+            for i in sorted(selected)
+        ]
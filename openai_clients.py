@@ -0,0 +1,84 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import httpx
+import openai
+from datetime import datetime
+
+
+def key_hash(api_key):
+    return hashlib.sha256((api_key or "").encode()).hexdigest()
+
+
+class OpenAIClientPool:
+    """OpenAI clients shared across reruns and sessions, plus a TTL-cached model catalog.
+
+    Every client, and every ChatOpenAI built with `http_client`, sends its
+    requests through one keep-alive connection pool, so reruns reuse open
+    TLS connections instead of handshaking again. Clients are kept per
+    sha256 of the API key (at most `max_clients`, least recently used
+    dropped first), and each key's filtered, sorted GPT model list is
+    cached for `catalog_ttl` seconds. `base_url` points everything at
+    another OpenAI-compatible server, such as a local stub.
+
+    Async requests share `http_async_client`. Its connections belong to
+    the event loop that opened them, so it is only awaited on the
+    process-wide loop from `utils.event_loop`.
+    """
+
+    def __init__(self, base_url=None, catalog_ttl=600, max_clients=64, max_connections=20):
+        self.base_url = base_url
+        self.catalog_ttl = catalog_ttl
+        self.max_clients = max_clients
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.http_client = openai.DefaultHttpxClient(limits=limits)
+        self.http_async_client = openai.DefaultAsyncHttpxClient(limits=limits)
+        self.lock = threading.Lock()
+        self.clients = OrderedDict()
+        # key hash -> (fetched at, model ids)
+        self.catalogs = {}
+        self.catalog_hits = 0
+        self.catalog_misses = 0
+
+    def client(self, api_key):
+        key = key_hash(api_key)
+        with self.lock:
+            client = self.clients.get(key)
+            if client is not None:
+                self.clients.move_to_end(key)
+                return client
+            client = openai.OpenAI(api_key=api_key, base_url=self.base_url, http_client=self.http_client)
+            self.clients[key] = client
+            if len(self.clients) > self.max_clients:
+                evicted, _ = self.clients.popitem(last=False)
+                self.catalogs.pop(evicted, None)
+            return client
+
+    def gpt_models(self, api_key):
+        """GPT model ids available to `api_key`, oldest first; errors are raised, not cached"""
+        key = key_hash(api_key)
+        with self.lock:
+            cached = self.catalogs.get(key)
+            if cached and time.monotonic() - cached[0] < self.catalog_ttl:
+                self.catalog_hits += 1
+                return cached[1]
+            self.catalog_misses += 1
+        models = [
+            {"id": i.id, "created": datetime.fromtimestamp(i.created)}
+            for i in self.client(api_key).models.list() if str(i.id).startswith("gpt")
+        ]
+        models = [i["id"] for i in sorted(models, key=lambda x: x["created"])]
+        with self.lock:
+            self.catalogs[key] = (time.monotonic(), models)
+        return models
+
+    def stats(self):
+        total = self.catalog_hits + self.catalog_misses
+        with self.lock:
+            return {
+                "clients": len(self.clients),
+                "catalog_hits": self.catalog_hits,
+                "catalog_misses": self.catalog_misses,
+                "catalog_hit_rate": self.catalog_hits / total if total else 0.0
+            }
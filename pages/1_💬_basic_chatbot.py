@@ -2,6 +2,7 @@ import utils
 import streamlit as st
 from streaming import StreamHandler
 from langchain.chains import ConversationChain
+from conversation_memory import BudgetedSummaryMemory
 
 st.set_page_config(
     page_title="🌐 VJCET Customer Service Agent",
@@ -81,6 +82,9 @@ class RegionalSupportAgent:
     def __init__(self):
         utils.sync_st_session()
         self.llm = utils.configure_llm()
+        # only with PERSIST_CHAT_SESSIONS=1: the session id in the URL restores the whole chat
+        self.session_store = utils.configure_session_store() if utils.chat_sessions_enabled() else None
+        self.session_id = utils.chat_session_id() if self.session_store else None
         self.language_map = {
             "English": "en",
             "Malayalam": "ml",
@@ -90,7 +94,46 @@ class RegionalSupportAgent:
         }
     
     def setup_chain(self):
-        return ConversationChain(llm=self.llm, verbose=False)
+        """This session's chain, rebuilt only when the LLM changes; the memory is always kept"""
+        chain_key = f"{type(self).__name__}_chain"
+        version = utils.llm_cache_key(self.llm)
+        cached = st.session_state.get(chain_key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        restored = None
+        if cached:
+            memory = cached[1].memory
+            memory.llm = self.llm
+        else:
+            memory, restored = self.restore_memory()
+        chain = ConversationChain(llm=self.llm, memory=memory, verbose=False)
+        st.session_state[chain_key] = (version, chain)
+        if restored:
+            # show the restored conversation; the next run finds the chain in the session
+            st.session_state["messages"] = restored
+            st.rerun()
+        return chain
+
+    def restore_memory(self):
+        """Memory saved for this session before a restart, else seeded from the displayed messages"""
+        memory = BudgetedSummaryMemory(llm=self.llm)
+        saved = self.session_store.load(self.session_id) if self.session_store else None
+        if saved:
+            messages, state = saved
+            memory.restore(state)
+            if len(st.session_state.get("messages", [])) <= 1 and len(messages) > 1:
+                return memory, messages
+            return memory, None
+
+        messages = st.session_state.get("messages", [])
+        # the same wrapped prompts generate_response saves
+        memory.seed([
+            (self.language_prompt(question["content"], question.get("language", "English")), answer["content"])
+            for question, answer in zip(messages, messages[1:])
+            if question["role"] == "user" and answer["role"] == "assistant"
+        ])
+        return memory, None
     
     def language_selector(self):
         col1, col2 = st.columns([1, 3])
@@ -130,13 +173,17 @@ class RegionalSupportAgent:
             "language": language
         })
     
+    def language_prompt(self, query, language):
+        """The chain's input for `query`; this is also what the memory keeps of it"""
+        return f"""Respond in {language} ({self.language_map[language]}) to the following:
+                {query}
+                Maintain natural conversational style and cultural appropriateness."""
+
     def generate_response(self, chain, query, language):
         with st.chat_message("assistant"):
             st_cb = StreamHandler(st.empty())
             try:
-                lang_prompt = f"""Respond in {language} ({self.language_map[language]}) to the following:
-                {query}
-                Maintain natural conversational style and cultural appropriateness."""
+                lang_prompt = self.language_prompt(query, language)
                 
                 result = chain.invoke(
                     {"input": lang_prompt},
@@ -145,6 +192,10 @@ class RegionalSupportAgent:
                 response = result["response"]
                 self.display_message(response, "assistant", language)
                 utils.print_qa(RegionalSupportAgent, query, response)
+                utils.report_stream(RegionalSupportAgent, st_cb)
+                utils.report_memory(chain.memory)
+                if self.session_store:
+                    self.session_store.save(self.session_id, st.session_state.messages, chain.memory.state())
                 
             except Exception as e:
                 error_msg = f"⚠️ Error: {str(e)}. Please try again or rephrase your question."
@@ -1,12 +1,13 @@
 import os
 import utils
-import hashlib
 import streamlit as st
 from streaming import StreamHandler
+from extraction import PDF_TYPE, hash_upload, iter_document_pages, save_upload
+from lexical_index import HybridRetriever
 
-from langchain.memory import ConversationBufferMemory
+from conversation_memory import BudgetedSummaryMemory
 from langchain.chains import ConversationalRetrievalChain
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
@@ -73,15 +74,19 @@ class PersistentDocChatbot:
         self.embedding_model = utils.configure_embedding_model()
         self.vector_store_path = "vjcet_vector_store"
         self.processed_hashes_path = "processed_hashes.txt"
+        self.embed_batch_size = 256
+        self.pipeline = utils.configure_retrieval_pipeline()
+        # VECTOR_FORMAT=int8 (or float16) stores new segments compactly; compaction converts old ones
+        self.vector_format = os.environ.get("VECTOR_FORMAT", "faiss")
+        self.resident_index = utils.configure_faiss_index(
+            self.vector_store_path, self.embedding_model, self.vector_format
+        )
+        self.lexical_index = utils.open_lexical_index("vjcet_lexical_index.db")
+        self.sync_lexical_index()
 
-    def save_file(self, file):
-        """Save uploaded file to temporary directory"""
-        folder = 'uploaded_docs'
-        os.makedirs(folder, exist_ok=True)
-        file_path = os.path.join(folder, file.name)
-        with open(file_path, 'wb') as f:
-            f.write(file.getvalue())
-        return file_path
+    def save_file(self, file, file_hash):
+        """Save uploaded file in streamed blocks under a folder named by its content hash"""
+        return save_upload(file, os.path.join('uploaded_docs', file_hash[:16]))
 
     def load_existing_hashes(self):
         """Load set of processed file hashes"""
@@ -93,55 +98,116 @@ class PersistentDocChatbot:
     def update_vector_store(self, uploaded_files):
         """Process new documents and update persistent vector store"""
         processed_hashes = self.load_existing_hashes()
-        new_docs = []
+        new_files = []
         
+        # this runs on every rerun while files stay selected, so only new files are written
         for file in uploaded_files:
-            file_hash = hashlib.sha256(file.getvalue()).hexdigest()
+            file_hash = hash_upload(file)
             if file_hash not in processed_hashes:
-                file_path = self.save_file(file)
-                loader = PyPDFLoader(file_path)
-                new_docs.extend(loader.load())
-                processed_hashes.add(file_hash)
-        
-        if new_docs:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            splits = text_splitter.split_documents(new_docs)
-            
-            if os.path.exists(self.vector_store_path):
-                vectordb = FAISS.load_local(self.vector_store_path, self.embedding_model, allow_dangerous_deserialization=True)
-                vectordb.add_documents(splits)
-            else:
-                vectordb = FAISS.from_documents(splits, self.embedding_model)
-            
-            vectordb.save_local(self.vector_store_path)
-            with open(self.processed_hashes_path, 'w') as f:
-                f.write('\n'.join(processed_hashes))
+                file_path, _ = self.save_file(file, file_hash)
+                new_files.append((file, file_path, file_hash))
 
-    def get_qa_chain(self):
-        """Create conversation chain with persistent vector store"""
-        vectordb = FAISS.load_local(self.vector_store_path, self.embedding_model, allow_dangerous_deserialization=True)
-        
-        retriever = vectordb.as_retriever(
-            search_type='mmr',
-            search_kwargs={'k': 2, 'fetch_k': 4}
+        if not new_files:
+            return
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200
         )
+        # the new files become one segment; the existing index is not touched
+        vectordb = None
+
+        # pages stream from the parser straight into embedding batches
+        failed = set()
+        splits = []
+        for page in iter_document_pages([(file.name, PDF_TYPE, file_path) for file, file_path, _ in new_files]):
+            file, file_path, _ = new_files[page.file_index]
+            if page.error is not None:
+                st.sidebar.error(f"Error processing {file.name}: {str(page.error)}")
+                failed.add(page.file_index)
+                continue
+            doc = Document(page_content=page.text, metadata={"source": file_path, "page": page.page})
+            splits.extend(text_splitter.split_documents([doc]))
+            if len(splits) >= self.embed_batch_size:
+                vectordb = self.add_splits(vectordb, splits)
+                splits = []
+        if splits:
+            vectordb = self.add_splits(vectordb, splits)
+
+        if vectordb is not None:
+            self.resident_index.append(vectordb)
+            ids = list(vectordb.index_to_docstore_id.values())
+            self.lexical_index.add(ids, [vectordb.docstore.search(i) for i in ids])
+            self.lexical_index.commit()
+        processed_hashes.update(file_hash for i, (_, _, file_hash) in enumerate(new_files) if i not in failed)
+        with open(self.processed_hashes_path, 'w') as f:
+            f.write('\n'.join(processed_hashes))
+
+    def add_splits(self, vectordb, splits):
+        if vectordb is None:
+            return FAISS.from_documents(splits, self.embedding_model)
+        vectordb.add_documents(splits)
+        return vectordb
+
+    def sync_lexical_index(self):
+        """Build the BM25 index once for a vector store that predates it, before any upload adds to it"""
+        if len(self.lexical_index):
+            return
+        segments = self.resident_index.get()
+        if segments is None:
+            return
+        for name, segment in segments.segments.items():
+            documents = segment.documents()
+            self.lexical_index.add([doc.id or f"{name}-{i}" for i, doc in enumerate(documents)], documents)
+        self.lexical_index.commit()
 
-        memory = ConversationBufferMemory(
-            memory_key='chat_history',
-            output_key='answer',
-            return_messages=True
+    def get_qa_chain(self):
+        """This session's chain, rebuilt when the served segments or the LLM change; the memory is kept"""
+        vectordb = self.resident_index.get()
+        chain_key = f"{type(self).__name__}_qa_chain"
+        llm_key = utils.llm_cache_key(self.llm)
+        cached = st.session_state.get(chain_key)
+        if cached and cached[0] is vectordb and cached[1] == llm_key:
+            return cached[2]
+
+        retriever = HybridRetriever(
+            vector_retriever=vectordb.as_retriever(
+                search_type='mmr',
+                search_kwargs={'k': 2, 'fetch_k': 4}
+            ),
+            lexical_index=self.lexical_index,
+            k=2
         )
 
-        return ConversationalRetrievalChain.from_llm(
+        if cached:
+            memory = cached[2].memory
+            memory.llm = self.llm
+        else:
+            memory = BudgetedSummaryMemory(
+                llm=self.llm,
+                memory_key='chat_history',
+                output_key='answer',
+                return_messages=True
+            )
+
+        qa_chain = ConversationalRetrievalChain.from_llm(
             llm=self.llm,
             retriever=retriever,
             memory=memory,
             return_source_documents=True,
             verbose=False
         )
+        # keyed by the segment set itself: a hot swap installs a new one
+        st.session_state[chain_key] = (vectordb, llm_key, qa_chain)
+        return qa_chain
+
+    def render_references(self, sources):
+        for idx, doc in enumerate(sources, 1):
+            filename = os.path.basename(doc.metadata['source'])
+            page_num = doc.metadata['page']
+            with st.popover(f"📖 Reference {idx}: {filename} (Page {page_num})"):
+                st.markdown(f"**Excerpt from page {page_num}:**")
+                st.caption(doc.page_content)
 
     @utils.enable_chat_history
     def main(self):
@@ -158,7 +224,7 @@ class PersistentDocChatbot:
             st.sidebar.success(f"Processed {len(uploaded_files)} new documents")
 
         # Check for existing knowledge base
-        if not os.path.exists(self.vector_store_path):
+        if self.resident_index.stamp() is None:
             st.error("No documents in knowledge base. Please upload initial documents!")
             return
 
@@ -170,21 +236,14 @@ class PersistentDocChatbot:
 
             with st.chat_message("assistant"):
                 st_cb = StreamHandler(st.empty())
-                result = qa_chain.invoke(
-                    {"question": user_query},
-                    {"callbacks": [st_cb]}
-                )
+                # references show up as soon as they are retrieved, below the streaming answer
+                result = self.pipeline.invoke(qa_chain, user_query, [st_cb], on_sources=self.render_references)
                 response = result["answer"]
+                utils.report_retrieval_paths(self.pipeline)
+                utils.report_stream(type(self), st_cb)
+                utils.report_memory(qa_chain.memory)
                 st.session_state.messages.append({"role": "assistant", "content": response})
 
-                # Display references
-                for idx, doc in enumerate(result['source_documents'], 1):
-                    filename = os.path.basename(doc.metadata['source'])
-                    page_num = doc.metadata['page']
-                    with st.popover(f"📖 Reference {idx}: {filename} (Page {page_num})"):
-                        st.markdown(f"**Excerpt from page {page_num}:**")
-                        st.caption(doc.page_content)
-
 if __name__ == "__main__":
     obj = PersistentDocChatbot()
     obj.main()
\ No newline at end of file
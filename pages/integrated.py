@@ -1,22 +1,12 @@
 import streamlit as st
-import os
-import json
-import shutil
-import time
+import queue
+import asyncio
 import utils
-import requests
 import traceback
-import validators
-from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
+from contextlib import aclosing
+from knowledge_base import KnowledgeBasePage
 from streaming import StreamHandler
-import PyPDF2
-import docx2txt
-from langchain.memory import ConversationBufferMemory
-from langchain.chains import ConversationalRetrievalChain
-from langchain_core.documents.base import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
+from langchain_core.prompts import ChatPromptTemplate
 
 # Set page config must be the first Streamlit command
 st.set_page_config(
@@ -134,18 +124,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class VJCETChatAssistant:
+# the language instruction only reaches the answer step, never the retriever's embedding
+ANSWER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Use the following pieces of context to answer the user's question. \n"
+               "If you don't know the answer, just say that you don't know, don't try to make up an answer.\n"
+               "{language_instruction}\n"
+               "----------------\n"
+               "{context}"),
+    ("human", "{question}")
+])
+
+class VJCETChatAssistant(KnowledgeBasePage):
 
     def __init__(self):
         utils.sync_st_session()
         self.llm = utils.configure_llm()
-        self.embedding_model = utils.configure_embedding_model()
-        self.visited_urls = set()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
-            'Accept-Language': 'en-US,en;q=0.9'
-        })
+        super().__init__()
+        self.answer_cache = utils.configure_answer_cache(self.embedding_model)
+        self.pipeline = utils.configure_retrieval_pipeline()
+        self.event_loop = utils.event_loop()
         
         # Language configuration
         self.language_map = {
@@ -181,194 +178,6 @@ class VJCETChatAssistant:
         }
         return flags.get(language, "🌐")
 
-    def load_sources(self):
-        if os.path.exists("sources.json"):
-            with open("sources.json", "r") as f:
-                st.session_state["sources"] = json.load(f)
-
-    def save_sources(self):
-        with open("sources.json", "w") as f:
-            json.dump(st.session_state.get("sources", []), f)
-
-    def is_same_domain(self, base_url, check_url):
-        base_domain = urlparse(base_url).netloc
-        check_domain = urlparse(check_url).netloc
-        return base_domain == check_domain
-
-    def crawl_website(self, base_url, max_pages=20, delay=1.0):
-        urls_to_visit = [base_url]
-        collected_urls = []
-        self.visited_urls.clear()
-        max_retries = 2
-
-        while urls_to_visit and len(collected_urls) < max_pages:
-            current_url = urls_to_visit.pop(0)
-            if current_url in self.visited_urls:
-                continue
-            
-            retries = 0
-            success = False
-            while retries <= max_retries and not success:
-                try:
-                    response = self.session.get(current_url, timeout=20)
-                    if response.status_code == 200:
-                        success = True
-                        time.sleep(delay)
-                    else:
-                        st.sidebar.warning(f"HTTP {response.status_code} at {current_url}")
-                        break
-                except Exception as e:
-                    if retries == max_retries:
-                        st.sidebar.error(f"Failed to fetch {current_url} after {max_retries} retries: {str(e)}")
-                        break
-                    retries += 1
-                    time.sleep(delay * retries)
-
-            if not success:
-                continue
-
-            if 'text/html' not in response.headers.get('Content-Type', ''):
-                st.sidebar.warning(f"Skipping non-HTML content at {current_url}")
-                continue
-
-            self.visited_urls.add(current_url)
-            collected_urls.append(current_url)
-            st.sidebar.info(f"🌐 Crawling: {current_url}")
-
-            try:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                for link in soup.find_all('a', href=True):
-                    href = link['href'].split('#')[0].split('?')[0].strip()
-                    if href and not href.startswith(('mailto:', 'tel:', 'javascript:')):
-                        full_url = urljoin(current_url, href)
-                        if (validators.url(full_url) and 
-                            self.is_same_domain(base_url, full_url) and 
-                            full_url not in self.visited_urls and 
-                            full_url not in urls_to_visit):
-                            urls_to_visit.append(full_url)
-            except Exception as e:
-                st.sidebar.error(f"Error parsing {current_url}: {str(e)}")
-
-        return collected_urls
-
-    def scrape_page(self, url):
-        try:
-            proxy_url = f"https://r.jina.ai/{url}"
-            response = self.session.get(proxy_url, timeout=25)
-            response.raise_for_status()
-            
-            if len(response.text) < 500:
-                st.warning(f"Page {url} contains minimal content - may not be useful")
-                
-            return response.text
-        except requests.exceptions.HTTPError as e:
-            st.error(f"Proxy error ({e.response.status_code}) for {url}")
-        except Exception as e:
-            st.error(f"Failed to scrape {url}: {str(e)}")
-        return None
-
-    def process_document(self, file):
-        try:
-            if file.type == "application/pdf":
-                text = []
-                pdf = PyPDF2.PdfReader(file)
-                for i, page in enumerate(pdf.pages):
-                    page_text = page.extract_text()
-                    if not page_text.strip():
-                        st.warning(f"Page {i+1} in {file.name} appears empty")
-                    text.append(page_text)
-                return "\n".join(text)
-            elif file.type == "text/plain":
-                return file.read().decode("utf-8")
-            elif file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                return docx2txt.process(file)
-            return None
-        except Exception as e:
-            st.error(f"Error processing {file.name}: {str(e)}")
-            return None
-
-    def handle_file_upload(self, uploaded_files):
-        if not uploaded_files:
-            return
-
-        progress_bar = st.sidebar.progress(0)
-        status_text = st.sidebar.empty()
-        total_files = len(uploaded_files)
-
-        vectordb = Chroma(
-            persist_directory="chroma_store",
-            embedding_function=self.embedding_model
-        )
-
-        for i, file in enumerate(uploaded_files):
-            status_text.text(f"📄 Processing {i+1}/{total_files}: {file.name}")
-            progress_bar.progress((i+1)/total_files)
-
-            content = self.process_document(file)
-            if not content:
-                continue
-
-            doc = Document(
-                page_content=content,
-                metadata={"source": f"📄 {file.name}"}
-            )
-
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1500,
-                chunk_overlap=300
-            )
-            splits = text_splitter.split_documents([doc])
-            
-            try:
-                vectordb.add_documents(splits)
-                vectordb.persist()
-                st.session_state.sources.append(f"📄 {file.name}")
-                st.sidebar.success(f"✅ Processed: {file.name}")
-            except Exception as e:
-                st.sidebar.error(f"❌ Error adding {file.name}: {str(e)}")
-
-        progress_bar.empty()
-        status_text.success("🎉 All files processed!")
-        self.save_sources()
-
-    def setup_vectordb(self):
-        try:
-            return Chroma(
-                persist_directory="chroma_store",
-                embedding_function=self.embedding_model
-            )
-        except Exception as e:
-            st.error(f"VectorDB error: {str(e)}")
-            return None
-
-    def setup_qa_chain(self):
-        vectordb = self.setup_vectordb()
-        if not vectordb:
-            return None
-
-        retriever = vectordb.as_retriever(
-            search_type='mmr',
-            search_kwargs={
-                'k': 5,
-                'fetch_k': 15,
-                'lambda_mult': 0.75
-            }
-        )
-
-        memory = ConversationBufferMemory(
-            memory_key='chat_history',
-            output_key='answer',
-            return_messages=True
-        )
-
-        return ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=retriever,
-            memory=memory,
-            return_source_documents=True,
-            verbose=True
-        )
-
     def language_selector(self):
         return st.selectbox(
             "Choose Conversation Language:",
@@ -424,10 +233,19 @@ class VJCETChatAssistant:
                 with col1:
                     max_pages = st.number_input("Max Pages", 5, 100, 20)
                 with col2:
-                    crawl_delay = st.number_input("Delay (sec)", 0.5, 5.0, 1.0)
+                    crawl_rate = st.number_input("Requests/sec", 0.5, 20.0, 4.0)
                 
+                use_reader_proxy = st.checkbox(
+                    "Use r.jina.ai reader for thin pages",
+                    value=False,
+                    help="Re-fetch pages whose local extraction is nearly empty through the r.jina.ai proxy"
+                )
+
                 if st.button("🌐 Add Websites", help="Start website crawling process"):
-                    self.handle_website_input(web_url, max_pages, crawl_delay)
+                    self.handle_website_input(web_url, max_pages, crawl_rate, use_reader_proxy)
+
+                if st.button("🔄 Refresh Websites", help="Re-crawl known websites and re-embed only what changed"):
+                    self.refresh_websites(max_pages, crawl_rate, use_reader_proxy)
 
                 # Document Upload Section
                 uploaded_files = st.file_uploader(
@@ -445,7 +263,7 @@ class VJCETChatAssistant:
                     self.clear_all_data()
 
             # Main Chat Interface
-            qa_chain = self.setup_qa_chain()
+            qa_chain = self.setup_qa_chain(ANSWER_PROMPT)
             if not qa_chain:
                 st.error("No data loaded! Please add websites or documents first.")
                 st.stop()
@@ -461,110 +279,92 @@ class VJCETChatAssistant:
         """Handle the user query and display response"""
         lang_code = self.language_map[st.session_state.language]
         language_prompt = self.language_prompts[lang_code]
-        full_query = f"{language_prompt}\n\n{user_query}"
         
         self.display_message(user_query, 'user')
         with st.chat_message("assistant"):
             st_cb = StreamHandler(st.empty())
+            events = queue.Queue()
+            turn = self.event_loop.submit(self.answer(user_query, qa_chain, lang_code, language_prompt, events))
             try:
-                result = qa_chain.invoke(
-                    {"question": full_query},
-                    {"callbacks": [st_cb]}
-                )
-                response = result["answer"]
+                response, sources = self.render_answer(turn, events, st_cb)
+                utils.report_retrieval_paths(self.pipeline)
+                utils.report_memory(qa_chain.memory)
                 st.session_state.messages.append({"role": "assistant", "content": response})
 
-                with st.expander("📚 View Sources"):
-                    for idx, doc in enumerate(result['source_documents'], 1):
-                        source = doc.metadata['source']
-                        if source.startswith("📄"):
-                            st.markdown(f"**Document {idx}:** {source[2:]}")
-                        else:
-                            st.markdown(f"**Website {idx}:** [{source}]({source})")
-                        st.caption(doc.page_content[:400] + "...")
-                        
             except Exception as e:
                 st.error(f"Error processing query: {str(e)}")
                 traceback.print_exc()
+            finally:
+                # a new question reruns the script, which cancels this turn's tasks and LLM stream
+                turn.cancel()
+
+    def render_answer(self, turn, events, st_cb):
+        """Render a turn's sources and tokens as `answer` produces them; returns (answer, sources).
+
+        Streamlit calls have to come from the script thread, so `answer`
+        runs on the shared event loop and only queues what to show.
+        """
+        turn.add_done_callback(lambda _: events.put(("done", None)))
+        while True:
+            kind, value = events.get()
+            if kind == "sources":
+                self.render_sources(value)
+            elif kind == "token":
+                st_cb.on_llm_new_token(value)
+            else:
+                break
+        response, sources, similarity = turn.result()
+        if similarity is not None:
+            st_cb.container.markdown(response)
+            st.caption(f"⚡ Answered from cache (similarity {similarity:.2f}, "
+                       f"hit rate {self.answer_cache.stats()['hit_rate']:.0%})")
+            self.render_sources(sources)
+        else:
+            st_cb.on_llm_end(None)
+            utils.report_stream(type(self), st_cb)
+        return response, sources
+
+    async def answer(self, user_query, qa_chain, lang_code, language_prompt, events):
+        """Answer one turn, queueing ("sources", docs) and ("token", text) events.
+
+        Returns (answer, sources, similarity); similarity is None unless
+        the answer came from the cache. The answer cache lookup and
+        retrieval run concurrently. A cache hit cancels the retrieval; on a
+        miss the sources are queued as soon as they are retrieved, before
+        the answer's tokens. The loop is shared by every session, so the
+        blocking cache and memory calls run in threads.
+        """
+        prepared = await self.pipeline.aprepare(qa_chain, user_query)
+        corpus_version = utils.store_version()
+        retrieval = asyncio.ensure_future(self.pipeline.aretrieve(qa_chain, prepared))
+        try:
+            cached = await asyncio.to_thread(self.answer_cache.lookup, prepared.standalone, lang_code, corpus_version)
+            if cached:
+                response, sources, similarity = cached
+                await asyncio.to_thread(qa_chain.memory.save_context, {"question": user_query}, {"answer": response})
+                return response, sources, similarity
+
+            sources = await retrieval
+            events.put(("sources", sources))
+            tokens = self.pipeline.astream(qa_chain, prepared, sources, {"language_instruction": language_prompt})
+            parts = []
+            async with aclosing(tokens):
+                async for token in tokens:
+                    parts.append(token)
+                    events.put(("token", token))
+            response = "".join(parts)
+            await asyncio.to_thread(
+                self.answer_cache.put, prepared.standalone, lang_code, corpus_version, response, sources
+            )
+            return response, sources, None
+        finally:
+            retrieval.cancel()
 
     def display_message(self, content, role):
         bubble_class = "user-bubble" if role == "user" else "assistant-bubble"
         st.markdown(f'<div class="chat-bubble {bubble_class}">{content}</div>', unsafe_allow_html=True)
         st.session_state.messages.append({"role": role, "content": content})
 
-    def handle_website_input(self, input_urls, max_pages, crawl_delay):
-        urls = [url.strip() for url in input_urls.split('\n') if url.strip()]
-        new_urls = []
-        
-        for url in urls:
-            if not validators.url(url):
-                st.error(f"Invalid URL: {url}")
-                continue
-                
-            if url in st.session_state.get("sources", []):
-                st.warning(f"Already exists: {url}")
-                continue
-                
-            if self.process_website(url, max_pages, crawl_delay):
-                new_urls.append(url)
-                st.session_state.sources.append(url)
-
-        if new_urls:
-            st.success(f"Added {len(new_urls)} new websites!")
-            self.save_sources()
-
-    def process_website(self, url, max_pages, crawl_delay):
-        subpages = self.crawl_website(url, max_pages, crawl_delay)
-        if not subpages:
-            st.error(f"No pages found at {url}")
-            return False
-
-        vectordb = Chroma(
-            persist_directory="chroma_store",
-            embedding_function=self.embedding_model
-        )
-
-        progress_bar = st.sidebar.progress(0)
-        status_text = st.sidebar.empty()
-        total_pages = len(subpages)
-
-        for i, page_url in enumerate(subpages):
-            status_text.text(f"🌐 Processing page {i+1}/{total_pages}")
-            progress_bar.progress((i+1)/total_pages)
-            
-            content = self.scrape_page(page_url)
-            if not content:
-                continue
-                
-            doc = Document(
-                page_content=content,
-                metadata={"source": page_url}
-            )
-            
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1500,
-                chunk_overlap=300
-            )
-            splits = text_splitter.split_documents([doc])
-            
-            try:
-                vectordb.add_documents(splits)
-                vectordb.persist()
-            except Exception as e:
-                st.error(f"Error adding {page_url}: {str(e)}")
-
-        progress_bar.empty()
-        status_text.success(f"✅ Finished processing {url}")
-        return True
-
-    def clear_all_data(self):
-        st.session_state["sources"] = []
-        if os.path.exists("chroma_store"):
-            shutil.rmtree("chroma_store")
-        if os.path.exists("sources.json"):
-            os.remove("sources.json")
-        st.rerun()
-
 def main():
     # Initialize and run the assistant
     assistant = VJCETChatAssistant()
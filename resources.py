@@ -0,0 +1,71 @@
+import threading
+from collections import OrderedDict
+
+
+class ResourceRegistry:
+    """Process-wide resources grouped into namespaces with their own eviction policy.
+
+    `get(namespace, key, factory)` builds a resource once per key and
+    hands the same object to every session; concurrent first calls wait
+    for a single build. A namespace listed in `max_entries` keeps at most
+    that many resources and evicts the least recently used; the others
+    only lose entries through `evict`, so a model load is never undone by
+    something another user did. `stats` counts loads, hits and evictions
+    per namespace.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = dict(max_entries or {})
+        self.lock = threading.Lock()
+        self.namespaces = {}
+        self.building = {}
+        self.counts = {}
+
+    def count(self, namespace, event):
+        counts = self.counts.setdefault(namespace, {"loads": 0, "hits": 0, "evictions": 0})
+        counts[event] += 1
+
+    def get(self, namespace, key, factory):
+        with self.lock:
+            entries = self.namespaces.setdefault(namespace, OrderedDict())
+            if key in entries:
+                entries.move_to_end(key)
+                self.count(namespace, "hits")
+                return entries[key]
+            build_lock = self.building.setdefault((namespace, key), threading.Lock())
+
+        with build_lock:
+            with self.lock:
+                if key in entries:
+                    self.count(namespace, "hits")
+                    return entries[key]
+            resource = factory()
+            with self.lock:
+                entries[key] = resource
+                self.count(namespace, "loads")
+                self.building.pop((namespace, key), None)
+                limit = self.max_entries.get(namespace)
+                while limit is not None and len(entries) > limit:
+                    entries.popitem(last=False)
+                    self.count(namespace, "evictions")
+        return resource
+
+    def evict(self, namespace, key=None, where=None):
+        """Drop one entry, the entries whose key satisfies `where`, or the whole namespace"""
+        with self.lock:
+            entries = self.namespaces.get(namespace, {})
+            if key is not None:
+                keys = [key] if key in entries else []
+            else:
+                keys = [k for k in entries if where is None or where(k)]
+            for k in keys:
+                del entries[k]
+                self.count(namespace, "evictions")
+            return len(keys)
+
+    def stats(self):
+        with self.lock:
+            return {
+                namespace: {**counts, "entries": len(self.namespaces.get(namespace, {}))}
+                for namespace, counts in self.counts.items()
+            }
@@ -0,0 +1,179 @@
+import re
+import asyncio
+import threading
+from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.messages import get_buffer_string
+
+# words that only make sense against an earlier turn
+FOLLOW_UP_WORDS = {
+    'it', 'its', 'they', 'them', 'their', 'theirs', 'this', 'that', 'these', 'those',
+    'he', 'him', 'his', 'she', 'her', 'hers', 'there', 'then', 'former', 'latter',
+    'above', 'previous', 'same', 'else', 'another', 'other', 'one', 'ones'
+}
+FOLLOW_UP_OPENERS = ('and', 'also', 'but', 'so', 'what about', 'how about', 'why not', 'more', 'ok', 'okay')
+PATHS = ('first_turn', 'self_contained', 'condensed', 'speculative_reused')
+
+
+def is_self_contained(question):
+    """Cheap check for questions that can be retrieved on as asked.
+
+    Short fragments, questions opening like a continuation and questions
+    with pronouns or other back-references are sent to the condense step.
+    Text in other scripts cannot be judged this way and is always condensed.
+    """
+    text = question.strip().lower()
+    if not text.isascii():
+        return False
+    words = re.findall(r"[a-z0-9']+", text)
+    if len(words) < 4 or text.startswith(FOLLOW_UP_OPENERS):
+        return False
+    return not any(word in FOLLOW_UP_WORDS for word in words)
+
+
+def same_question(a, b):
+    normalize = lambda text: ' '.join(re.findall(r"\w+", text.lower()))
+    return normalize(a) == normalize(b)
+
+
+@dataclass
+class PreparedQuestion:
+    question: str
+    standalone: str
+    path: str
+    # a concurrent Future from `prepare`, an asyncio Task from `aprepare`
+    speculative: Future = None
+
+
+class RetrievalPipeline:
+    """Runs a ConversationalRetrievalChain's steps with the condense call off the critical path.
+
+    The chain always asks the LLM to rephrase a follow-up before it
+    retrieves. Here the rephrase is skipped on the first turn and for
+    questions that `is_self_contained`. With `parallel`, retrieval on the
+    raw question also starts while the condense call is in flight, and
+    its results are used if the rewrite comes back unchanged. `stats`
+    counts how often each path was taken.
+
+    `aprepare`, `aretrieve` and `astream` are the asyncio versions. They
+    run on one event loop, so the caller can overlap them with other work,
+    and cancelling the caller's task stops the LLM stream.
+    """
+
+    def __init__(self, parallel=True, max_workers=4):
+        self.parallel = parallel
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.counts = dict.fromkeys(PATHS, 0)
+
+    def prepare(self, qa_chain, question):
+        """Work out the standalone question, condensing only when it is needed"""
+        chat_history = qa_chain.memory.load_memory_variables({})[qa_chain.memory.memory_key]
+        if not chat_history:
+            return self.prepared(question, question, 'first_turn')
+        if is_self_contained(question):
+            return self.prepared(question, question, 'self_contained')
+
+        speculative = self.executor.submit(qa_chain.retriever.invoke, question) if self.parallel else None
+        get_chat_history = qa_chain.get_chat_history or get_buffer_string
+        standalone = qa_chain.question_generator.invoke(
+            {"question": question, "chat_history": get_chat_history(chat_history)}
+        )[qa_chain.question_generator.output_key]
+        if speculative is not None and same_question(standalone, question):
+            return self.prepared(question, standalone, 'speculative_reused', speculative)
+        return self.prepared(question, standalone, 'condensed')
+
+    def prepared(self, question, standalone, path, speculative=None):
+        with self.lock:
+            self.counts[path] += 1
+        return PreparedQuestion(question, standalone, path, speculative)
+
+    def retrieve(self, qa_chain, prepared):
+        if prepared.speculative is not None:
+            return prepared.speculative.result()
+        return qa_chain.retriever.invoke(prepared.standalone)
+
+    def generate(self, qa_chain, prepared, docs, callbacks=None, inputs=None):
+        """Answer from `docs` and record the exchange in the chain's memory.
+
+        `inputs` are extra variables of the answer prompt (such as a
+        language instruction); they never reach condensing or retrieval.
+        """
+        answer = qa_chain.combine_docs_chain.invoke(
+            {"input_documents": docs, "question": prepared.standalone, **(inputs or {})},
+            {"callbacks": callbacks or []}
+        )[qa_chain.combine_docs_chain.output_key]
+        qa_chain.memory.save_context({"question": prepared.question}, {"answer": answer})
+        return answer
+
+    def invoke(self, qa_chain, question, callbacks=None, inputs=None, on_sources=None):
+        """Drop-in for `qa_chain.invoke({"question": question})` with the same output keys.
+
+        `on_sources` is called with the retrieved documents before the
+        answer is generated, so they can be shown while it streams.
+        """
+        prepared = self.prepare(qa_chain, question)
+        docs = self.retrieve(qa_chain, prepared)
+        if on_sources is not None:
+            on_sources(docs)
+        return {
+            "question": question,
+            "generated_question": prepared.standalone,
+            "answer": self.generate(qa_chain, prepared, docs, callbacks, inputs),
+            "source_documents": docs
+        }
+
+    async def aprepare(self, qa_chain, question):
+        chat_history = qa_chain.memory.load_memory_variables({})[qa_chain.memory.memory_key]
+        if not chat_history:
+            return self.prepared(question, question, 'first_turn')
+        if is_self_contained(question):
+            return self.prepared(question, question, 'self_contained')
+
+        speculative = asyncio.ensure_future(qa_chain.retriever.ainvoke(question)) if self.parallel else None
+        get_chat_history = qa_chain.get_chat_history or get_buffer_string
+        try:
+            standalone = (await qa_chain.question_generator.ainvoke(
+                {"question": question, "chat_history": get_chat_history(chat_history)}
+            ))[qa_chain.question_generator.output_key]
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+            raise
+        if speculative is not None and same_question(standalone, question):
+            return self.prepared(question, standalone, 'speculative_reused', speculative)
+        if speculative is not None:
+            speculative.cancel()
+        return self.prepared(question, standalone, 'condensed')
+
+    async def aretrieve(self, qa_chain, prepared):
+        if prepared.speculative is not None:
+            return await prepared.speculative
+        return await qa_chain.retriever.ainvoke(prepared.standalone)
+
+    async def astream(self, qa_chain, prepared, docs, inputs=None):
+        """Yield the answer's tokens as the LLM produces them.
+
+        The exchange is saved to the chain's memory only once the stream
+        has finished, so a cancelled turn leaves no half answer behind. The
+        save counts tokens and prunes under a lock, so it runs in a thread
+        rather than on the event loop every session shares.
+        """
+        tokens = []
+        async for event in qa_chain.combine_docs_chain.astream_events(
+            {"input_documents": docs, "question": prepared.standalone, **(inputs or {})},
+            version="v2"
+        ):
+            if event["event"] == "on_chat_model_stream" and event["data"]["chunk"].content:
+                tokens.append(event["data"]["chunk"].content)
+                yield tokens[-1]
+        await asyncio.to_thread(
+            qa_chain.memory.save_context, {"question": prepared.question}, {"answer": "".join(tokens)}
+        )
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        condense_calls = counts['condensed'] + counts['speculative_reused']
+        return {**counts, "condense_skip_rate": 1 - condense_calls / total if total else 0.0}
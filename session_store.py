@@ -0,0 +1,55 @@
+import json
+import time
+import sqlite3
+import threading
+
+
+class ChatSessionStore:
+    """Each chat session's displayed messages and memory state, kept in SQLite.
+
+    Sessions are keyed by an id the browser keeps (see
+    `utils.chat_session_id`), so a conversation is picked up again after
+    the worker restarts. Whoever has the id can load the session, so it is
+    only used when `utils.chat_sessions_enabled`. Sessions untouched for
+    `ttl` seconds are deleted on the next save.
+    """
+
+    def __init__(self, path="chat_sessions.db", ttl=7 * 24 * 3600):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                messages TEXT NOT NULL,
+                memory TEXT NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+
+    def load(self, session_id):
+        """(messages, memory state) saved for `session_id`, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT messages, memory FROM sessions WHERE session_id = ? AND updated >= ?",
+                (session_id, time.time() - self.ttl)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def save(self, session_id, messages, memory_state):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(messages), json.dumps(memory_state), now)
+            )
+            self.conn.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,))
+            self.conn.commit()
+
+    def delete(self, session_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self.conn.commit()
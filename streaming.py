@@ -1,11 +1,63 @@
+import time
 from langchain_core.callbacks import BaseCallbackHandler
 
 class StreamHandler(BaseCallbackHandler):
-    
-    def __init__(self, container, initial_text=""):
+    """Streams LLM tokens into a Streamlit container.
+
+    Streamlit can only replace an element, so every render re-sends the
+    whole answer. Tokens are therefore coalesced and rendered at most once
+    per `flush_interval` seconds, or sooner once `flush_chars` characters
+    are pending, with a final render when the LLM finishes. A
+    `flush_interval` of 0 renders every token. `stats` reports
+    time-to-first-token (from when the handler was created), tokens per
+    second and the number of renders for the response.
+    """
+
+    def __init__(self, container, initial_text="", flush_interval=0.1, flush_chars=400):
         self.container = container
         self.text = initial_text
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self.pending = 0
+        self.renders = 0
+        self.tokens = 0
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.last_token_at = None
+        self.last_render_at = self.started
 
     def on_llm_new_token(self, token: str, **kwargs):
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        self.last_token_at = now
+        self.tokens += 1
         self.text += token
-        self.container.markdown(self.text)
\ No newline at end of file
+        self.pending += len(token)
+        if now - self.last_render_at >= self.flush_interval or self.pending >= self.flush_chars:
+            self.flush(now)
+
+    def on_llm_end(self, response, **kwargs):
+        if self.pending:
+            self.flush()
+
+    def on_llm_error(self, error, **kwargs):
+        if self.pending:
+            self.flush()
+
+    def flush(self, now=None):
+        self.container.markdown(self.text)
+        self.pending = 0
+        self.renders += 1
+        self.last_render_at = now or time.perf_counter()
+
+    def stats(self):
+        if self.first_token_at is None:
+            return {"ttft": None, "tokens": 0, "tokens_per_second": 0.0, "renders": self.renders}
+        streaming = self.last_token_at - self.first_token_at
+        return {
+            "ttft": self.first_token_at - self.started,
+            "tokens": self.tokens,
+            "tokens_per_second": (self.tokens - 1) / streaming if streaming > 0 else 0.0,
+            "renders": self.renders
+        }
@@ -1,14 +1,30 @@
 import os
+import time
+import uuid
 import openai
 import streamlit as st
-from datetime import datetime
 from streamlit.logger import get_logger
 from langchain_openai import ChatOpenAI
 from langchain_community.chat_models import ChatOllama
 from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+from langchain_community.vectorstores import Chroma
+from embedding_cache import CachedEmbeddings
+from answer_cache import SemanticAnswerCache
+from retrieval_pipeline import RetrievalPipeline
+from lexical_index import LexicalIndex
+from langchain_core.documents import Document
+from index_manager import ResidentIndex
+from session_store import ChatSessionStore
+from http_cache import HttpCache
+from resources import ResourceRegistry
+from event_loop import EventLoopThread
+from openai_clients import OpenAIClientPool, key_hash
 
 logger = get_logger('Langchain-Chatbot')
 
+# heavy resources shared by every session on this worker; only explicit evictions remove them
+registry = ResourceRegistry(max_entries={"llms": 64})
+
 #decorator
 def enable_chat_history(func):
     if os.environ.get("OPENAI_API_KEY"):
@@ -18,12 +34,8 @@ def enable_chat_history(func):
         if "current_page" not in st.session_state:
             st.session_state["current_page"] = current_page
         if st.session_state["current_page"] != current_page:
-            try:
-                st.cache_resource.clear()
-                del st.session_state["current_page"]
-                del st.session_state["messages"]
-            except:
-                pass
+            reset_page_state(st.session_state["current_page"])
+            st.session_state["current_page"] = current_page
 
         # to show chat history on ui
         if "messages" not in st.session_state:
@@ -35,6 +47,22 @@ def enable_chat_history(func):
         func(*args, **kwargs)
     return execute
 
+def reset_page_state(page):
+    """Forget this user's chat on `page` ("Class.main"): its messages and "Class_*" session keys.
+
+    The stored copy of the chat is deleted too, and the session id is
+    dropped from the URL so the next chat starts under a fresh one. Shared
+    resources in `registry` are left alone, so other users and the next
+    page keep their loaded models and indexes.
+    """
+    prefix = page.split(".")[0] + "_"
+    for key in [key for key in st.session_state if key == "messages" or key.startswith(prefix)]:
+        del st.session_state[key]
+    session_id = st.query_params.get("session")
+    if session_id:
+        configure_session_store().delete(session_id)
+        del st.query_params["session"]
+
 def display_msg(msg, author):
     """Method to display message on the UI
 
@@ -59,10 +87,7 @@ def choose_custom_openai_key():
 
     model = "gpt-4o-mini"
     try:
-        client = openai.OpenAI(api_key=openai_api_key)
-        available_models = [{"id": i.id, "created":datetime.fromtimestamp(i.created)} for i in client.models.list() if str(i.id).startswith("gpt")]
-        available_models = sorted(available_models, key=lambda x: x["created"])
-        available_models = [i["id"] for i in available_models]
+        available_models = openai_client_pool().gpt_models(openai_api_key)
 
         model = st.sidebar.selectbox(
             label="Model",
@@ -87,20 +112,158 @@ def configure_llm():
         )
     
     if llm_opt == "gpt-4o-mini":
-        llm = ChatOpenAI(model_name=llm_opt, temperature=0, streaming=True, api_key=st.secrets["OPENAI_API_KEY"])
+        llm = openai_llm(llm_opt, st.secrets["OPENAI_API_KEY"])
     else:
         model, openai_api_key = choose_custom_openai_key()
-        llm = ChatOpenAI(model_name=model, temperature=0, streaming=True, api_key=openai_api_key)
+        llm = openai_llm(model, openai_api_key)
     return llm
 
+def openai_client_pool():
+    """Process-wide OpenAI clients; OPENAI_BASE_URL points them at another compatible server"""
+    return registry.get("clients", "openai", lambda: OpenAIClientPool(base_url=os.environ.get("OPENAI_BASE_URL")))
+
+def openai_llm(model, api_key):
+    """Shared ChatOpenAI per model and key, sending requests over the pool's kept-alive connections"""
+    pool = openai_client_pool()
+    return registry.get(
+        "llms", (model, key_hash(api_key)),
+        lambda: ChatOpenAI(model_name=model, temperature=0, streaming=True, api_key=api_key,
+                           base_url=pool.base_url, http_client=pool.http_client,
+                           http_async_client=pool.http_async_client)
+    )
+
+def event_loop():
+    """Process-wide event loop for async chains; the shared LLMs' async connections belong to it"""
+    return registry.get("clients", "event_loop", EventLoopThread)
+
 def print_qa(cls, question, answer):
     log_str = "\nUsecase: {}\nQuestion: {}\nAnswer: {}\n" + "------"*10
     logger.info(log_str.format(cls.__name__, question, answer))
 
-@st.cache_resource
+def load_embedding_model(model_name):
+    with st.spinner("Loading embedding model..."):
+        logger.info(f"Loading embedding model {model_name}")
+        return CachedEmbeddings(FastEmbedEmbeddings(model_name=model_name), model_name)
+
 def configure_embedding_model():
-    embedding_model = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-    return embedding_model
+    model_name = "BAAI/bge-small-en-v1.5"
+    return registry.get("models", model_name, lambda: load_embedding_model(model_name))
+
+def configure_answer_cache(embedding_model):
+    """Process-wide semantic cache of answers, shared by every session"""
+    return registry.get("caches", "answers", lambda: SemanticAnswerCache(embedding_model))
+
+def configure_retrieval_pipeline():
+    """Process-wide retrieval pipeline, so its path counters cover every session"""
+    return registry.get("pipelines", "retrieval", RetrievalPipeline)
+
+def report_retrieval_paths(pipeline):
+    stats = pipeline.stats()
+    st.sidebar.caption(
+        f"🔀 Condense skipped for {stats['condense_skip_rate']:.0%} of questions "
+        f"(first turn {stats['first_turn']}, self-contained {stats['self_contained']}, "
+        f"condensed {stats['condensed']}, speculative retrieval reused {stats['speculative_reused']})"
+    )
+
+def report_stream(cls, handler):
+    stats = handler.stats()
+    if stats["ttft"] is None:
+        return
+    logger.info(
+        f"{cls.__name__}: first token after {stats['ttft']:.2f}s, {stats['tokens']} tokens "
+        f"at {stats['tokens_per_second']:.1f} tokens/s, {stats['renders']} renders"
+    )
+    st.sidebar.caption(
+        f"⏱️ First token {stats['ttft']:.2f}s · {stats['tokens_per_second']:.1f} tokens/s · "
+        f"{stats['renders']} renders for {stats['tokens']} tokens"
+    )
+
+def report_memory(memory):
+    stats = memory.stats()
+    if not stats["verbatim_tokens"]:
+        return
+    st.sidebar.caption(
+        f"🧠 History {stats['history_tokens']} tokens, {stats['tokens_saved']} saved against "
+        f"{stats['verbatim_tokens']} verbatim ({stats['summarized_messages']} messages summarized)"
+    )
+
+def chat_sessions_enabled():
+    """Whether chats are saved and restored by a `?session=` id in the URL (PERSIST_CHAT_SESSIONS=1).
+
+    Off by default: the id is the only key to a saved chat, so anyone who
+    opens a page link carrying it gets the transcript and memory back.
+    Sharing or bookmarking such a link shares the conversation.
+    """
+    return os.environ.get("PERSIST_CHAT_SESSIONS") == "1"
+
+def chat_session_id():
+    """Id of this browser's chat session, kept in the URL so it survives a server restart"""
+    session_id = st.query_params.get("session")
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        st.query_params["session"] = session_id
+    return session_id
+
+def configure_http_cache():
+    """Process-wide HTTP response cache, one SQLite connection for every crawl"""
+    return registry.get("caches", "http", HttpCache)
+
+def configure_session_store():
+    return registry.get("caches", "chat_sessions", ChatSessionStore)
+
+def llm_cache_key(llm):
+    """Identify an LLM configuration without keeping its API key around in clear"""
+    api_key = llm.openai_api_key.get_secret_value() if llm.openai_api_key else ""
+    return llm.model_name, key_hash(api_key)
+
+def store_version(persist_directory="chroma_store"):
+    """Version stamp of a vector store, changed whenever ingestion writes to it"""
+    try:
+        with open(f"{persist_directory}.version") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "0"
+
+def bump_store_version(persist_directory="chroma_store"):
+    with open(f"{persist_directory}.version", "w") as f:
+        f.write(str(time.time_ns()))
+
+def configure_vectordb(embedding_model, persist_directory="chroma_store"):
+    """Process-wide Chroma handle, reopened only after the store version changes"""
+    version = store_version(persist_directory)
+    # handles on older versions of this store are stale once a newer one is opened
+    registry.evict("vectordb", where=lambda key: key[0] == persist_directory and key[1] != version)
+    return registry.get(
+        "vectordb", (persist_directory, version),
+        lambda: Chroma(persist_directory=persist_directory, embedding_function=embedding_model)
+    )
+
+def open_lexical_index(path):
+    return registry.get("indexes", ("lexical", path), lambda: LexicalIndex(path))
+
+def configure_lexical_index(vectordb, path="lexical_index.db"):
+    """Process-wide BM25 index over the Chroma chunks, backfilled once from a store that predates it"""
+    lexical_index = open_lexical_index(path)
+    if not len(lexical_index):
+        data = vectordb.get(include=["documents", "metadatas"])
+        if data["ids"]:
+            lexical_index.add(data["ids"], [
+                Document(page_content=text, metadata=metadata or {})
+                for text, metadata in zip(data["documents"], data["metadatas"])
+            ])
+            lexical_index.commit()
+    return lexical_index
+
+def configure_faiss_index(path, embedding_model, vector_format="faiss"):
+    """Process-wide resident vector index, hot-swapped when the files on disk change.
+
+    `vector_format` is "faiss", or "float16" / "int8" for memory-mapped
+    quantized segments whose chunk texts stay on disk until they are hit.
+    """
+    return registry.get(
+        "indexes", ("faiss", path, vector_format),
+        lambda: ResidentIndex(path, embedding_model, vector_format=vector_format)
+    )
 
 def sync_st_session():
     for k, v in st.session_state.items():